@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine, event, text, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -21,11 +23,27 @@ engine = create_engine(
 
 # Enable WAL (Write-Ahead Logging) mode for SQLite to improve concurrency
 # This allows multiple readers while a writer is active
+# synchronous=NORMAL is safe in WAL mode and avoids an fsync on every commit
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
     if "sqlite" in SQLALCHEMY_DATABASE_URL:
         cursor = dbapi_conn.cursor()
         cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+# Extra tuning for the read-heavy batch scripts (feature computation, persona
+# assignment): memory-map up to 256MB of the database file, keep a ~200MB page
+# cache and build temp indexes/sorts in memory. Scripts register this on their
+# own engines; the API engine keeps SQLite's defaults.
+def set_sqlite_batch_pragmas(dbapi_conn, connection_record):
+    set_sqlite_pragma(dbapi_conn, connection_record)
+    if "sqlite" in SQLALCHEMY_DATABASE_URL:
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-200000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
         cursor.close()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -44,6 +62,18 @@ def get_db():
         db.close()
 
 
+def dialect_insert(db):
+    """
+    Return the dialect-specific insert() for a session's database.
+    
+    Both SQLite and PostgreSQL inserts support on_conflict_do_update(), which
+    lets batch jobs upsert rows in one statement instead of query-then-write.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert
+    return sqlite_insert
+
+
 def apply_migrations():
     """Apply database migrations for schema changes"""
     if "sqlite" not in SQLALCHEMY_DATABASE_URL:
@@ -77,6 +107,20 @@ def apply_migrations():
         # This migration was already applied via table recreation
         # New databases will be created correctly from model definitions
         # No action needed for existing databases (already migrated)
+        
+        # Migration 4: Index personas by persona_type
+        # create_all() does not add new indexes to existing tables
+        if "personas" in inspector.get_table_names():
+            indexes = [index["name"] for index in inspector.get_indexes("personas")]
+            if "idx_personas_type" not in indexes:
+                logger.info("Applying migration: Adding idx_personas_type index to personas table")
+                try:
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_personas_type ON personas (persona_type)"))
+                    conn.commit()
+                    logger.info("✓ Added idx_personas_type index to personas table")
+                except Exception as e:
+                    logger.warning(f"Migration failed (may already be applied): {e}")
+                    conn.rollback()
 
 
 def init_db():
@@ -184,6 +184,7 @@ class Persona(Base):
     __table_args__ = (
         UniqueConstraint('user_id', 'window_days', name='uq_personas_user_window'),
         Index('idx_personas_user', 'user_id'),
+        Index('idx_personas_type', 'persona_type'),
     )
 
     def __repr__(self):
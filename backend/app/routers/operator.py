@@ -15,7 +15,8 @@ from app.models import User, Persona, Recommendation, UserFeature, Transaction,
 from app.services.feature_detection import (
     get_transactions_in_window,
     get_accounts_by_type,
-    is_recurring_pattern
+    is_recurring_pattern,
+    CREDIT_CARD_ACCOUNT_TYPES
 )
 
 router = APIRouter(prefix="/operator", tags=["operator"])
@@ -135,7 +136,7 @@ def get_credit_card_details(db: Session, user_id: str) -> List[Dict[str, Any]]:
     Returns:
         List of credit card dictionaries with last_four, utilization, balance, limit
     """
-    credit_card_accounts = get_accounts_by_type(db, user_id, ['credit card'])
+    credit_card_accounts = get_accounts_by_type(db, user_id, CREDIT_CARD_ACCOUNT_TYPES)
     
     cards = []
     for account in credit_card_accounts:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Literal
+from typing import Any, List, Optional, Dict, Literal
 from datetime import datetime, date
 
 
@@ -306,6 +306,58 @@ class PersonaResponse(BaseModel):
         from_attributes = True
 
 
+# ============================================================================
+# User Context Schemas
+# ============================================================================
+
+class SubscriptionSignals(BaseModel):
+    """Subscription signals included in the recommendation context"""
+    recurring_merchants: int
+    monthly_recurring_spend: float
+    subscription_spend_share: float
+
+
+class SavingsSignals(BaseModel):
+    """Savings signals included in the recommendation context"""
+    net_savings_inflow: float
+    savings_growth_rate: float
+    emergency_fund_months: float
+
+
+class CreditSignals(BaseModel):
+    """Credit signals included in the recommendation context"""
+    avg_utilization: float
+    max_utilization: float
+    utilization_30_flag: bool
+    utilization_50_flag: bool
+    utilization_80_flag: bool
+    minimum_payment_only_flag: bool
+    interest_charges_present: bool
+    any_overdue: bool
+
+
+class IncomeSignals(BaseModel):
+    """Income signals included in the recommendation context"""
+    payroll_detected: bool
+    median_pay_gap_days: Optional[int]
+    income_variability: Optional[float]
+    cash_flow_buffer_months: float
+    avg_monthly_income: float
+
+
+class UserContext(BaseModel):
+    """Schema for the user context sent to OpenAI (see build_user_context)"""
+    user_id: str
+    window_days: int
+    persona_type: Optional[str]
+    subscription_signals: SubscriptionSignals
+    savings_signals: SavingsSignals
+    credit_signals: CreditSignals
+    income_signals: IncomeSignals
+    accounts: List[Dict[str, Any]]
+    recent_transactions: List[Dict[str, Any]]
+
+
 # ============================================================================
 # Recommendation Schemas
 # ============================================================================
@@ -9,18 +9,27 @@ Detects behavioral patterns from transaction data:
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
 from sqlalchemy.sql import func as sql_func
 from datetime import datetime, timedelta, date
-from collections import Counter
-from typing import List, Dict, Optional, Any
+from collections import Counter, defaultdict
+from typing import Iterable, List, Dict, Optional, Any
 import logging
 import statistics
 
+from app.database import dialect_insert
 from app.models import Transaction, Account, Liability, UserFeature
 
 logger = logging.getLogger(__name__)
 
+# Account type filters are module-level tuples so callers share one constant
+# instead of building a new list per call
+SAVINGS_ACCOUNT_TYPES = ('savings', 'money market', 'cash management', 'HSA')
+INVESTMENT_ACCOUNT_TYPES = ('brokerage', '401k', 'ira', 'roth_ira', 'investment', 'pension')
+CREDIT_CARD_ACCOUNT_TYPES = ('credit card',)
+CHECKING_ACCOUNT_TYPES = ('checking',)
+SAVINGS_AND_CHECKING_ACCOUNT_TYPES = SAVINGS_ACCOUNT_TYPES + CHECKING_ACCOUNT_TYPES
+
 
 # ============================================================================
 # Helper Functions
@@ -50,14 +59,14 @@ def get_transactions_in_window(db: Session, user_id: str, window_days: int) -> L
     return transactions
 
 
-def get_accounts_by_type(db: Session, user_id: str, account_types: List[str]) -> List[Account]:
+def get_accounts_by_type(db: Session, user_id: str, account_types: Iterable[str]) -> List[Account]:
     """
     Get accounts for a user filtered by account types.
     
     Args:
         db: Database session
         user_id: User ID to query
-        account_types: List of account types to filter (e.g., ['checking', 'savings'])
+        account_types: Account types to filter (e.g., CHECKING_ACCOUNT_TYPES)
     
     Returns:
         List of Account objects matching the types
@@ -72,6 +81,33 @@ def get_accounts_by_type(db: Session, user_id: str, account_types: List[str]) ->
     return accounts
 
 
+def get_credit_card_liabilities(db: Session, user_id: str) -> List[Liability]:
+    """
+    Get credit card liabilities for a user.
+    
+    Args:
+        db: Database session
+        user_id: User ID to query
+    
+    Returns:
+        List of Liability objects with liability_type 'credit_card'
+    """
+    return db.query(Liability).filter(
+        and_(
+            Liability.user_id == user_id,
+            Liability.liability_type == 'credit_card'
+        )
+    ).all()
+
+
+def _group_by(rows: Iterable[Any], attr: str) -> Dict[Any, List[Any]]:
+    """Group rows by an attribute, preserving row order within each group"""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, attr)].append(row)
+    return grouped
+
+
 # ============================================================================
 # Subscription Detection
 # ============================================================================
@@ -135,9 +171,12 @@ def compute_subscription_signals(db: Session, user_id: str, window_days: int) ->
         - monthly_recurring_spend: float (monthly average)
         - subscription_spend_share: float (0-1, ratio of recurring to total spend)
     """
-    # Get all transactions in window
     transactions = get_transactions_in_window(db, user_id, window_days)
-    
+    return _subscription_signals(transactions, window_days)
+
+
+def _subscription_signals(transactions: List[Transaction], window_days: int) -> Dict[str, float]:
+    """Subscription signals from a user's in-window transactions (date ascending)"""
     if not transactions:
         return {
             "recurring_merchants": 0,
@@ -215,9 +254,19 @@ def compute_savings_signals(db: Session, user_id: str, window_days: int) -> Dict
         - savings_growth_rate: float (0-1, average growth rate across accounts)
         - emergency_fund_months: float (months of expenses covered)
     """
+    accounts = get_accounts_by_type(db, user_id, SAVINGS_AND_CHECKING_ACCOUNT_TYPES)
+    transactions = get_transactions_in_window(db, user_id, window_days)
+    return _savings_signals(accounts, transactions, window_days)
+
+
+def _savings_signals(
+    accounts: List[Account],
+    transactions: List[Transaction],
+    window_days: int
+) -> Dict[str, float]:
+    """Savings signals from a user's accounts and in-window transactions"""
     # Get savings-type accounts
-    savings_account_types = ['savings', 'money market', 'cash management', 'HSA']
-    savings_accounts = get_accounts_by_type(db, user_id, savings_account_types)
+    savings_accounts = [acc for acc in accounts if acc.type in SAVINGS_ACCOUNT_TYPES]
     
     # If no savings accounts, return zero values
     if not savings_accounts:
@@ -228,20 +277,16 @@ def compute_savings_signals(db: Session, user_id: str, window_days: int) -> Dict
             "emergency_fund_months": 0.0
         }
     
+    transactions_by_account = _group_by(transactions, "account_id")
+    
     # Calculate net inflow for each savings account
     total_net_inflow = 0.0
     account_growth_rates = []
     
     for account in savings_accounts:
         # Get all transactions for this account in window
-        cutoff_date = date.today() - timedelta(days=window_days)
-        account_transactions = db.query(Transaction).filter(
-            and_(
-                Transaction.account_id == account.account_id,
-                Transaction.date >= cutoff_date
-            )
-        ).all()
-        
+        account_transactions = transactions_by_account.get(account.account_id, [])
+    
         # Separate deposits and withdrawals
         deposits = [txn.amount for txn in account_transactions if txn.amount > 0]
         withdrawals = [txn.amount for txn in account_transactions if txn.amount < 0]
@@ -274,21 +319,14 @@ def compute_savings_signals(db: Session, user_id: str, window_days: int) -> Dict
     
     # Calculate emergency fund months
     # Get checking account transactions to estimate monthly expenses
-    checking_accounts = get_accounts_by_type(db, user_id, ['checking'])
+    checking_accounts = [acc for acc in accounts if acc.type == 'checking']
     
     avg_monthly_expenses = 0.0
     if checking_accounts:
         # Get all checking account transactions in window
         checking_transactions = []
         for checking_account in checking_accounts:
-            cutoff_date = date.today() - timedelta(days=window_days)
-            account_transactions = db.query(Transaction).filter(
-                and_(
-                    Transaction.account_id == checking_account.account_id,
-                    Transaction.date >= cutoff_date
-                )
-            ).all()
-            checking_transactions.extend(account_transactions)
+            checking_transactions.extend(transactions_by_account.get(checking_account.account_id, []))
         
         # Filter to expense transactions (amount < 0)
         expenses = [abs(txn.amount) for txn in checking_transactions if txn.amount < 0]
@@ -343,8 +381,21 @@ def compute_credit_signals(db: Session, user_id: str, window_days: int) -> Dict[
         - interest_charges_present: bool (interest charges in window)
         - any_overdue: bool (any overdue accounts)
     """
-    # Query all credit card accounts for user
-    credit_card_accounts = get_accounts_by_type(db, user_id, ['credit card'])
+    credit_card_accounts = get_accounts_by_type(db, user_id, CREDIT_CARD_ACCOUNT_TYPES)
+    liabilities = get_credit_card_liabilities(db, user_id) if credit_card_accounts else []
+    transactions = get_transactions_in_window(db, user_id, window_days) if credit_card_accounts else []
+    return _credit_signals(user_id, credit_card_accounts, liabilities, transactions)
+
+
+def _credit_signals(
+    user_id: str,
+    accounts: List[Account],
+    liabilities: List[Liability],
+    transactions: List[Transaction]
+) -> Dict[str, Any]:
+    """Credit signals from a user's accounts, liabilities and in-window transactions"""
+    # All credit card accounts for user
+    credit_card_accounts = [acc for acc in accounts if acc.type == 'credit card']
     
     # If no credit cards, return zero/false values
     if not credit_card_accounts:
@@ -363,14 +414,11 @@ def compute_credit_signals(db: Session, user_id: str, window_days: int) -> Dict[
     # Get account IDs for joining with liabilities
     account_ids = [acc.account_id for acc in credit_card_accounts]
     
-    # Query liabilities for these credit card accounts
-    liabilities = db.query(Liability).filter(
-        and_(
-            Liability.user_id == user_id,
-            Liability.account_id.in_(account_ids),
-            Liability.liability_type == 'credit_card'
-        )
-    ).all()
+    # Liabilities for these credit card accounts
+    liabilities = [
+        liab for liab in liabilities
+        if liab.account_id in account_ids and liab.liability_type == 'credit_card'
+    ]
     
     # Create a mapping of account_id to liability for easy lookup
     liability_by_account = {liab.account_id: liab for liab in liabilities}
@@ -423,18 +471,13 @@ def compute_credit_signals(db: Session, user_id: str, window_days: int) -> Dict[
                     minimum_payment_only_flag = True
                     break
     
-    # Query transactions for interest charges in window
-    cutoff_date = date.today() - timedelta(days=window_days)
-    interest_transactions = db.query(Transaction).filter(
-        and_(
-            Transaction.user_id == user_id,
-            Transaction.account_id.in_(account_ids),
-            Transaction.date >= cutoff_date,
-            Transaction.category_detailed.ilike('%interest%')
-        )
-    ).all()
-    
-    interest_charges_present = len(interest_transactions) > 0
+    # Check transactions for interest charges in window
+    interest_charges_present = any(
+        txn.account_id in account_ids
+        and txn.category_detailed
+        and 'interest' in txn.category_detailed.lower()
+        for txn in transactions
+    )
     
     # Check for overdue accounts
     any_overdue = False
@@ -490,9 +533,18 @@ def compute_income_signals(db: Session, user_id: str, window_days: int) -> Dict[
         - cash_flow_buffer_months: float (months of expenses covered by checking balance)
         - avg_monthly_income: float (average monthly income in window)
     """
-    # Get all transactions for user in window
     transactions = get_transactions_in_window(db, user_id, window_days)
-    
+    checking_accounts = get_accounts_by_type(db, user_id, CHECKING_ACCOUNT_TYPES)
+    return _income_signals(user_id, checking_accounts, transactions, window_days)
+
+
+def _income_signals(
+    user_id: str,
+    accounts: List[Account],
+    transactions: List[Transaction],
+    window_days: int
+) -> Dict[str, Any]:
+    """Income signals from a user's accounts and in-window transactions"""
     # Filter for potential payroll deposits
     payroll_transactions = []
     for txn in transactions:
@@ -570,7 +622,7 @@ def compute_income_signals(db: Session, user_id: str, window_days: int) -> Dict[
     avg_monthly_income = round(total_payroll / months_in_window, 2) if months_in_window > 0 else 0.0
     
     # Get checking account(s) for user
-    checking_accounts = get_accounts_by_type(db, user_id, ['checking'])
+    checking_accounts = [acc for acc in accounts if acc.type == 'checking']
     
     # Calculate current checking balance (sum of balance_current)
     current_checking_balance = sum(acc.balance_current or 0.0 for acc in checking_accounts)
@@ -579,17 +631,11 @@ def compute_income_signals(db: Session, user_id: str, window_days: int) -> Dict[
     avg_monthly_expenses = 0.0
     if checking_accounts:
         # Get expense transactions (amount < 0) from checking accounts
-        checking_account_ids = [acc.account_id for acc in checking_accounts]
-        cutoff_date = date.today() - timedelta(days=window_days)
-        
-        expense_transactions = db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.account_id.in_(checking_account_ids),
-                Transaction.date >= cutoff_date,
-                Transaction.amount < 0
-            )
-        ).all()
+        checking_account_ids = {acc.account_id for acc in checking_accounts}
+        expense_transactions = [
+            txn for txn in transactions
+            if txn.account_id in checking_account_ids and txn.amount < 0
+        ]
         
         # Sum absolute values
         total_expenses = sum(abs(txn.amount) for txn in expense_transactions)
@@ -632,8 +678,7 @@ def detect_investment_accounts(db: Session, user_id: str) -> bool:
     Returns:
         True if any investment accounts exist, False otherwise
     """
-    investment_account_types = ['brokerage', '401k', 'ira', 'roth_ira', 'investment', 'pension']
-    investment_accounts = get_accounts_by_type(db, user_id, investment_account_types)
+    investment_accounts = get_accounts_by_type(db, user_id, INVESTMENT_ACCOUNT_TYPES)
     
     return len(investment_accounts) > 0
 
@@ -642,6 +687,35 @@ def detect_investment_accounts(db: Session, user_id: str) -> bool:
 # Feature Computation (All Signals Combined)
 # ============================================================================
 
+def _features_from_rows(
+    user_id: str,
+    accounts: List[Account],
+    liabilities: List[Liability],
+    transactions: List[Transaction],
+    window_days: int
+) -> Dict[str, Any]:
+    """
+    Combine all signals for one user from pre-fetched rows.
+    
+    Args:
+        user_id: User ID being analyzed (used for logging)
+        accounts: All of the user's accounts
+        liabilities: All of the user's liabilities
+        transactions: The user's transactions in the window, ordered by date ascending
+        window_days: Time window in days (30 or 180)
+    
+    Returns:
+        Dictionary with all computed features
+    """
+    return {
+        **_subscription_signals(transactions, window_days),
+        **_savings_signals(accounts, transactions, window_days),
+        **_credit_signals(user_id, accounts, liabilities, transactions),
+        **_income_signals(user_id, accounts, transactions, window_days),
+        "investment_account_detected": any(acc.type in INVESTMENT_ACCOUNT_TYPES for acc in accounts)
+    }
+
+
 def compute_all_features(db: Session, user_id: str, window_days: int) -> Dict[str, Any]:
     """
     Compute all behavioral features for a user and save to database.
@@ -663,23 +737,13 @@ def compute_all_features(db: Session, user_id: str, window_days: int) -> Dict[st
     Returns:
         Dictionary with all computed features
     """
-    # Call all 4 signal detection functions
-    subscription_signals = compute_subscription_signals(db, user_id, window_days)
-    savings_signals = compute_savings_signals(db, user_id, window_days)
-    credit_signals = compute_credit_signals(db, user_id, window_days)
-    income_signals = compute_income_signals(db, user_id, window_days)
-    
-    # Call detect_investment_accounts()
-    investment_detected = detect_investment_accounts(db, user_id)
-    
-    # Combine all results into single dict
-    all_features = {
-        **subscription_signals,
-        **savings_signals,
-        **credit_signals,
-        **income_signals,
-        "investment_account_detected": investment_detected
-    }
+    # Load the user's accounts, liabilities and in-window transactions once
+    # and derive every signal from them
+    accounts = db.query(Account).filter(Account.user_id == user_id).all()
+    liabilities = db.query(Liability).filter(Liability.user_id == user_id).all()
+    transactions = get_transactions_in_window(db, user_id, window_days)
+    
+    all_features = _features_from_rows(user_id, accounts, liabilities, transactions, window_days)
     
     # Create or update UserFeature record in database
     # Check if record exists
@@ -712,3 +776,98 @@ def compute_all_features(db: Session, user_id: str, window_days: int) -> Dict[st
     # Return computed features
     return all_features
 
+
+def compute_all_features_bulk(
+    db: Session,
+    user_ids: List[str],
+    window_days: int,
+    commit: bool = True,
+    errors: Optional[Dict[str, Exception]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute all behavioral features for many users and save to database.
+    
+    Same signals as compute_all_features(), but accounts, liabilities and
+    in-window transactions for every user are loaded with one IN query each,
+    and all UserFeature rows are written with a single upsert and commit.
+    A user whose signals raise is logged and skipped, so one bad user
+    doesn't stop the rest of the window from being saved.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to analyze
+        window_days: Time window in days (30 or 180)
+        commit: Commit the upsert (False leaves it in the caller's transaction)
+        errors: Optional dict; skipped users are recorded here
+            (user_id -> exception)
+    
+    Returns:
+        Dictionary mapping user_id to its computed features (skipped users
+        are left out)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    
+    cutoff_date = date.today() - timedelta(days=window_days)
+    
+    accounts_by_user = _group_by(
+        db.scalars(select(Account).where(Account.user_id.in_(user_ids))),
+        "user_id"
+    )
+    liabilities_by_user = _group_by(
+        db.scalars(select(Liability).where(Liability.user_id.in_(user_ids))),
+        "user_id"
+    )
+    transactions_by_user = _group_by(
+        db.scalars(
+            select(Transaction)
+            .where(
+                Transaction.user_id.in_(user_ids),
+                Transaction.date >= cutoff_date
+            )
+            .order_by(Transaction.date.asc())
+        ),
+        "user_id"
+    )
+    
+    features_by_user = {}
+    for user_id in user_ids:
+        try:
+            features_by_user[user_id] = _features_from_rows(
+                user_id,
+                accounts_by_user.get(user_id, []),
+                liabilities_by_user.get(user_id, []),
+                transactions_by_user.get(user_id, []),
+                window_days
+            )
+        except Exception as e:
+            logger.error(f"Error computing {window_days}d features for user {user_id}: {e}", exc_info=True)
+            if errors is not None:
+                errors[user_id] = e
+    
+    if not features_by_user:
+        return {}
+    
+    # Upsert on the (user_id, window_days) unique constraint
+    computed_at = datetime.now()
+    rows = [
+        {"user_id": user_id, "window_days": window_days, "computed_at": computed_at, **features}
+        for user_id, features in features_by_user.items()
+    ]
+    insert_stmt = dialect_insert(db)(UserFeature)
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[UserFeature.user_id, UserFeature.window_days],
+        set_={
+            key: insert_stmt.excluded[key]
+            for key in rows[0]
+            if key not in ("user_id", "window_days")
+        }
+    )
+    db.execute(upsert_stmt, rows)
+    if commit:
+        db.commit()
+    
+    logger.info(f"Computed and saved features for {len(features_by_user)} users, window {window_days}d")
+    
+    return features_by_user
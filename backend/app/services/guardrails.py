@@ -14,6 +14,7 @@ from sqlalchemy import and_
 from typing import Dict, Any, List, Optional
 import logging
 import json
+import re
 
 from app.models import User, UserFeature, Account, ProductOffer
 
@@ -24,6 +25,34 @@ logger = logging.getLogger(__name__)
 # Tone Validation
 # ============================================================================
 
+# Forbidden phrases (CRITICAL - RED in operator UI)
+FORBIDDEN_PHRASES = (
+    "you're overspending",
+    "bad habit",
+    "poor financial decision",
+    "irresponsible",
+    "wasteful spending",
+    "you should stop",
+    "you need to"
+)
+
+# Empowering language (NOTABLE - YELLOW in operator UI)
+EMPOWERING_KEYWORDS = (
+    "you can",
+    "let's",
+    "many people",
+    "common challenge",
+    "opportunity",
+    "consider",
+    "explore"
+)
+
+# Each list compiled once into a single alternation, so checking content is
+# one scan instead of one substring search per phrase
+FORBIDDEN_RE = re.compile("|".join(map(re.escape, FORBIDDEN_PHRASES)))
+EMPOWERING_RE = re.compile("|".join(map(re.escape, EMPOWERING_KEYWORDS)))
+
+
 def validate_tone(content: str) -> Dict[str, Any]:
     """
     Validates content for tone compliance.
@@ -83,20 +112,10 @@ def validate_tone(content: str) -> Dict[str, Any]:
     # Convert content to lowercase for checking
     content_lower = content.lower()
     
-    # Forbidden phrases (CRITICAL - RED in operator UI)
-    forbidden_phrases = [
-        "you're overspending",
-        "bad habit",
-        "poor financial decision",
-        "irresponsible",
-        "wasteful spending",
-        "you should stop",
-        "you need to"
-    ]
-    
-    # Loop through forbidden phrases
-    for phrase in forbidden_phrases:
-        if phrase in content_lower:
+    # Forbidden phrases found in one pass; warn once per phrase, in list order
+    found_phrases = set(FORBIDDEN_RE.findall(content_lower))
+    for phrase in FORBIDDEN_PHRASES:
+        if phrase in found_phrases:
             warnings.append({
                 "severity": "critical",
                 "type": "forbidden_phrase",
@@ -104,19 +123,8 @@ def validate_tone(content: str) -> Dict[str, Any]:
             })
             logger.warning(f"Tone validation failed: Found forbidden phrase '{phrase}'")
     
-    # Empowering language check (NOTABLE - YELLOW in operator UI)
-    empowering_keywords = [
-        "you can",
-        "let's",
-        "many people",
-        "common challenge",
-        "opportunity",
-        "consider",
-        "explore"
-    ]
-    
     # Check if at least one empowering keyword present
-    has_empowering_language = any(keyword in content_lower for keyword in empowering_keywords)
+    has_empowering_language = EMPOWERING_RE.search(content_lower) is not None
     
     if not has_empowering_language:
         warnings.append({
@@ -435,32 +443,50 @@ def filter_partner_offers(db: Session, user_id: str, offers: List[Dict[str, Any]
     Returns:
         Filtered list of offers (only those user is eligible for)
     """
+    metadatas = [offer.get("metadata", {}) for offer in offers]
+    
+    # The user's 30d features and account types are looked up once, only if
+    # some offer has a requirement that needs them
+    user_feature = None
+    if any("min_income" in md or "max_utilization" in md for md in metadatas):
+        user_feature = db.query(UserFeature).filter(
+            and_(
+                UserFeature.user_id == user_id,
+                UserFeature.window_days == 30
+            )
+        ).first()
+        if not user_feature:
+            logger.warning(f"User {user_id} has no features computed for offer eligibility checks")
+    
+    account_types = set()
+    if any("required_account_type" in md for md in metadatas):
+        account_types = {
+            account_type for (account_type,) in
+            db.query(Account.type).filter(Account.user_id == user_id).distinct()
+        }
+    
     filtered_offers = []
     
-    for offer in offers:
+    for offer, metadata in zip(offers, metadatas):
         is_eligible = True
         
-        # Check eligibility requirements if present in offer metadata
-        metadata = offer.get("metadata", {})
-        
         # Check income requirement
         if "min_income" in metadata:
-            min_income = metadata["min_income"]
-            if not check_income_eligibility(db, user_id, min_income):
+            avg_monthly_income = (user_feature.avg_monthly_income or 0.0) if user_feature else None
+            if avg_monthly_income is None or avg_monthly_income < metadata["min_income"]:
                 is_eligible = False
                 logger.debug(f"Offer {offer.get('offer_id', 'unknown')} filtered: income requirement not met")
         
         # Check credit requirement
         if "max_utilization" in metadata:
-            max_utilization = metadata["max_utilization"]
-            if not check_credit_eligibility(db, user_id, max_utilization):
+            max_utilization = (user_feature.max_utilization or 0.0) if user_feature else None
+            if max_utilization is None or max_utilization > metadata["max_utilization"]:
                 is_eligible = False
                 logger.debug(f"Offer {offer.get('offer_id', 'unknown')} filtered: credit requirement not met")
         
         # Check account existence requirement
         if "required_account_type" in metadata:
-            account_type = metadata["required_account_type"]
-            if not check_account_exists(db, user_id, account_type):
+            if metadata["required_account_type"] not in account_types:
                 is_eligible = False
                 logger.debug(f"Offer {offer.get('offer_id', 'unknown')} filtered: required account type not found")
         
@@ -12,10 +12,11 @@ Assigns user personas based on computed behavioral features:
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func
 from datetime import datetime, timedelta, date
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, List, Optional
 import json
 import logging
 
+from app.database import dialect_insert
 from app.models import UserFeature, Persona, Account, Transaction
 
 logger = logging.getLogger(__name__)
@@ -81,6 +82,21 @@ def has_overdraft_or_late_fees(db: Session, user_id: str, window_days: int) -> b
     return fee_transactions is not None
 
 
+def _user_lookup(ctx: Optional[Dict[str, Any]], key: str, compute):
+    """
+    Return ctx[key], computing and storing it on first use.
+    
+    ctx holds window-independent per-user reads so they are made once per
+    user, across checks and across the 30d/180d assignments. Without a ctx
+    the value is simply computed.
+    """
+    if ctx is None:
+        return compute()
+    if key not in ctx:
+        ctx[key] = compute()
+    return ctx[key]
+
+
 # ============================================================================
 # Persona Check Functions
 # ============================================================================
@@ -185,7 +201,7 @@ def check_savings_builder(features: UserFeature) -> bool:
     )
 
 
-def check_wealth_builder(db: Session, features: UserFeature) -> bool:
+def check_wealth_builder(db: Session, features: UserFeature, ctx: Optional[Dict[str, Any]] = None) -> bool:
     """
     Check if user matches wealth_builder persona.
     
@@ -199,6 +215,7 @@ def check_wealth_builder(db: Session, features: UserFeature) -> bool:
     Args:
         db: Database session
         features: UserFeature object
+        ctx: Optional per-user cache for window-independent lookups
     
     Returns:
         True if matches criteria, False otherwise
@@ -207,7 +224,9 @@ def check_wealth_builder(db: Session, features: UserFeature) -> bool:
     if avg_income <= 10000:
         return False
     
-    savings_balance = get_total_savings_balance(db, features.user_id)
+    savings_balance = _user_lookup(
+        ctx, 'savings_balance', lambda: get_total_savings_balance(db, features.user_id)
+    )
     if savings_balance <= 25000:
         return False
     
@@ -216,7 +235,9 @@ def check_wealth_builder(db: Session, features: UserFeature) -> bool:
         return False
     
     # Check for overdrafts/late fees (use 180-day window for wealth builder check)
-    has_fees = has_overdraft_or_late_fees(db, features.user_id, 180)
+    has_fees = _user_lookup(
+        ctx, 'has_fees_180d', lambda: has_overdraft_or_late_fees(db, features.user_id, 180)
+    )
     if has_fees:
         return False
     
@@ -231,7 +252,12 @@ def check_wealth_builder(db: Session, features: UserFeature) -> bool:
 # Persona Assignment Logic
 # ============================================================================
 
-def assign_persona(db: Session, user_id: str, window_days: int) -> Tuple[str, float, Dict[str, Any]]:
+def assign_persona(
+    db: Session,
+    user_id: str,
+    window_days: int,
+    ctx: Optional[Dict[str, Any]] = None
+) -> Tuple[str, float, Dict[str, Any]]:
     """
     Assign persona to user based on computed features.
     
@@ -248,6 +274,7 @@ def assign_persona(db: Session, user_id: str, window_days: int) -> Tuple[str, fl
         db: Database session
         user_id: User ID to assign persona for
         window_days: Time window (30 or 180)
+        ctx: Optional per-user cache, shared across windows, for user-level lookups
     
     Returns:
         Tuple of (persona_type, confidence_score, reasoning_dict)
@@ -260,6 +287,20 @@ def assign_persona(db: Session, user_id: str, window_days: int) -> Tuple[str, fl
         )
     ).first()
     
+    return _assign_persona_from_features(db, user_id, window_days, features, ctx)
+
+
+def _assign_persona_from_features(
+    db: Session,
+    user_id: str,
+    window_days: int,
+    features: Optional[UserFeature],
+    ctx: Optional[Dict[str, Any]] = None
+) -> Tuple[str, float, Dict[str, Any]]:
+    """Persona assignment for already-loaded features (see assign_persona)"""
+    if ctx is None:
+        ctx = {}
+    
     # If no features found, return savings_builder as fallback with very low confidence
     if not features:
         logger.warning(f"No features found for user {user_id}, window {window_days}d - assigning savings_builder as fallback")
@@ -274,20 +315,23 @@ def assign_persona(db: Session, user_id: str, window_days: int) -> Tuple[str, fl
     matched_personas = []
     
     # Check wealth_builder first (priority 1.0)
-    if check_wealth_builder(db, features):
+    if check_wealth_builder(db, features, ctx):
+        savings_balance = _user_lookup(
+            ctx, 'savings_balance', lambda: get_total_savings_balance(db, user_id)
+        )
         matched_personas.append({
             'type': 'wealth_builder',
             'priority': 1.0,
             'criteria': [
                 f'avg_monthly_income={features.avg_monthly_income:.2f} > 10000',
-                f'savings_balance={get_total_savings_balance(db, user_id):.2f} > 25000',
+                f'savings_balance={savings_balance:.2f} > 25000',
                 f'max_utilization={features.max_utilization:.2%} <= 0.20',
                 'no_overdraft_or_late_fees=True',
                 f'investment_account_detected={features.investment_account_detected}'
             ],
             'feature_values': {
                 'avg_monthly_income': features.avg_monthly_income,
-                'savings_balance': get_total_savings_balance(db, user_id),
+                'savings_balance': savings_balance,
                 'max_utilization': features.max_utilization,
                 'investment_account_detected': features.investment_account_detected
             }
@@ -410,7 +454,8 @@ def create_or_update_persona(
     window_days: int,
     persona_type: str,
     confidence: float,
-    reasoning: Dict[str, Any]
+    reasoning: Dict[str, Any],
+    commit: bool = True
 ) -> Persona:
     """
     Create or update Persona record in database.
@@ -422,6 +467,8 @@ def create_or_update_persona(
         persona_type: Persona type string
         confidence: Confidence score (0.0-1.0)
         reasoning: Reasoning dictionary (will be JSON-serialized)
+        commit: Commit immediately; pass False to only flush and let a batch
+            caller commit many personas at once
     
     Returns:
         Persona object (created or updated)
@@ -443,8 +490,11 @@ def create_or_update_persona(
         existing_persona.confidence_score = confidence
         existing_persona.reasoning = reasoning_json
         existing_persona.assigned_at = datetime.now()
-        db.commit()
-        db.refresh(existing_persona)
+        if commit:
+            db.commit()
+            db.refresh(existing_persona)
+        else:
+            db.flush()
         logger.info(f"Updated persona for user {user_id}, window {window_days}d: {persona_type}")
         return existing_persona
     else:
@@ -458,29 +508,181 @@ def create_or_update_persona(
             assigned_at=datetime.now()
         )
         db.add(new_persona)
-        db.commit()
-        db.refresh(new_persona)
+        if commit:
+            db.commit()
+            db.refresh(new_persona)
+        else:
+            db.flush()
         logger.info(f"Created persona for user {user_id}, window {window_days}d: {persona_type}")
         return new_persona
 
 
-def assign_and_save_persona(db: Session, user_id: str, window_days: int) -> Persona:
+def assign_and_save_persona(
+    db: Session,
+    user_id: str,
+    window_days: int,
+    ctx: Optional[Dict[str, Any]] = None,
+    commit: bool = True
+) -> Persona:
     """
     Main function to assign and save persona for a user.
     
+    Pass the same ctx dict when assigning several windows for one user so
+    user-level lookups (e.g. savings balance) are only queried once.
+    
     Args:
         db: Database session
         user_id: User ID to assign persona for
         window_days: Time window (30 or 180)
+        ctx: Optional per-user cache for window-independent lookups
+        commit: Commit the persona immediately (False leaves it flushed for the caller)
     
     Returns:
         Persona object (created or updated)
     """
     # Call assign_persona() to get type, confidence, reasoning
-    persona_type, confidence, reasoning = assign_persona(db, user_id, window_days)
+    persona_type, confidence, reasoning = assign_persona(db, user_id, window_days, ctx)
     
     # Call create_or_update_persona() to save
-    persona = create_or_update_persona(db, user_id, window_days, persona_type, confidence, reasoning)
+    persona = create_or_update_persona(
+        db, user_id, window_days, persona_type, confidence, reasoning, commit=commit
+    )
     
     return persona
 
+
+def assign_personas_bulk(
+    db: Session,
+    user_ids: List[str],
+    window_days: int,
+    ctx_by_user: Optional[Dict[str, Dict[str, Any]]] = None,
+    errors: Optional[Dict[str, Exception]] = None
+) -> Dict[str, Tuple[str, float, Dict[str, Any]]]:
+    """
+    Assign personas for many users without saving them.
+    
+    Loads every user's features for the window with a single query and
+    assigns personas in Python.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to assign personas for
+        window_days: Time window (30 or 180)
+        ctx_by_user: Optional per-user caches (user_id -> ctx); pass the same
+            dict for both windows so user-level lookups are shared
+        errors: Optional dict; when given, a user whose assignment raises is
+            recorded here (user_id -> exception) and skipped instead of
+            aborting the whole batch
+    
+    Returns:
+        Dictionary mapping user_id to (persona_type, confidence_score, reasoning)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    if ctx_by_user is None:
+        ctx_by_user = {}
+    
+    features_by_user = {
+        features.user_id: features
+        for features in db.query(UserFeature).filter(
+            and_(
+                UserFeature.user_id.in_(user_ids),
+                UserFeature.window_days == window_days
+            )
+        )
+    }
+    
+    assignments = {}
+    for user_id in user_ids:
+        try:
+            assignments[user_id] = _assign_persona_from_features(
+                db, user_id, window_days, features_by_user.get(user_id), ctx_by_user.setdefault(user_id, {})
+            )
+        except Exception as e:
+            if errors is None:
+                raise
+            errors[user_id] = e
+    
+    return assignments
+
+
+def save_personas_bulk(
+    db: Session,
+    assignments: Dict[str, Tuple[str, float, Dict[str, Any]]],
+    window_days: int,
+    commit: bool = True
+) -> None:
+    """
+    Save many users' personas for a window with one upsert.
+    
+    Args:
+        db: Database session
+        assignments: user_id -> (persona_type, confidence_score, reasoning),
+            as returned by assign_personas_bulk()
+        window_days: Time window (30 or 180)
+        commit: Commit the upsert (False leaves it in the caller's transaction)
+    """
+    if not assignments:
+        return
+    
+    assigned_at = datetime.now()
+    rows = [
+        {
+            'user_id': user_id,
+            'window_days': window_days,
+            'persona_type': persona_type,
+            'confidence_score': confidence,
+            'reasoning': json.dumps(reasoning),
+            'assigned_at': assigned_at
+        }
+        for user_id, (persona_type, confidence, reasoning) in assignments.items()
+    ]
+    
+    # Upsert on the (user_id, window_days) unique constraint
+    insert_stmt = dialect_insert(db)(Persona)
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[Persona.user_id, Persona.window_days],
+        set_={
+            key: insert_stmt.excluded[key]
+            for key in ('persona_type', 'confidence_score', 'reasoning', 'assigned_at')
+        }
+    )
+    db.execute(upsert_stmt, rows)
+    if commit:
+        db.commit()
+    
+    logger.info(f"Saved personas for {len(rows)} users, window {window_days}d")
+
+
+def assign_and_save_personas_bulk(
+    db: Session,
+    user_ids: List[str],
+    window_days: int,
+    ctx_by_user: Optional[Dict[str, Dict[str, Any]]] = None,
+    commit: bool = True
+) -> Dict[str, Tuple[str, float]]:
+    """
+    Assign and save personas for many users in one pass.
+    
+    Loads every user's features for the window with a single query, assigns
+    personas in Python, and writes all Persona rows with one upsert and commit.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to assign personas for
+        window_days: Time window (30 or 180)
+        ctx_by_user: Optional per-user caches (user_id -> ctx); pass the same
+            dict for both windows so user-level lookups are shared
+        commit: Commit the upsert (False leaves it in the caller's transaction)
+    
+    Returns:
+        Dictionary mapping user_id to (persona_type, confidence_score)
+    """
+    assignments = assign_personas_bulk(db, user_ids, window_days, ctx_by_user)
+    save_personas_bulk(db, assignments, window_days, commit=commit)
+    
+    return {
+        user_id: (persona_type, confidence)
+        for user_id, (persona_type, confidence, _) in assignments.items()
+    }
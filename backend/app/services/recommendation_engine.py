@@ -6,19 +6,23 @@ Context includes user features, accounts, transactions, and persona-specific dat
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import JSON, String, and_, cast, desc, func, select
 from datetime import datetime, timedelta, date
 from typing import Dict, Any, Optional, List
 import logging
 import os
 import json
 import time
+import orjson
 from dotenv import load_dotenv
+from pydantic import ValidationError
 
 from app.models import User, UserFeature, Persona, Account, Transaction, Liability
+from app.schemas import UserContext
 from app.utils.prompt_loader import load_prompt
 from app.services.product_matcher import match_products
 from app.services.guardrails import filter_eligible_products
+from app.services.feature_detection import SAVINGS_ACCOUNT_TYPES
 
 load_dotenv()
 
@@ -55,19 +59,223 @@ def get_openai_client():
 # User Context Builder
 # ============================================================================
 
+# Recent transactions in the context always cover the last 30 days, whatever the window
+RECENT_TRANSACTIONS_PERIOD = timedelta(days=30)
+
+# Signal blocks included in the context: (UserFeature attribute, default) pairs.
+# Missing/falsy values fall back to the default; floats are rounded to 2 places.
+CONTEXT_SIGNAL_FIELDS = {
+    "subscription_signals": (
+        ("recurring_merchants", 0),
+        ("monthly_recurring_spend", 0.0),
+        ("subscription_spend_share", 0.0),
+    ),
+    "savings_signals": (
+        ("net_savings_inflow", 0.0),
+        ("savings_growth_rate", 0.0),
+        ("emergency_fund_months", 0.0),
+    ),
+    "credit_signals": (
+        ("avg_utilization", 0.0),
+        ("max_utilization", 0.0),
+        ("utilization_30_flag", False),
+        ("utilization_50_flag", False),
+        ("utilization_80_flag", False),
+        ("minimum_payment_only_flag", False),
+        ("interest_charges_present", False),
+        ("any_overdue", False),
+    ),
+    "income_signals": (
+        ("payroll_detected", False),
+        ("median_pay_gap_days", None),
+        ("income_variability", None),
+        ("cash_flow_buffer_months", 0.0),
+        ("avg_monthly_income", 0.0),
+    ),
+}
+
+
+def _signal_values(user_feature: UserFeature, fields: tuple) -> Dict[str, Any]:
+    """
+    Read one signal block from a UserFeature record.
+    
+    Args:
+        user_feature: UserFeature record to read from
+        fields: (attribute, default) pairs from CONTEXT_SIGNAL_FIELDS
+    
+    Returns:
+        Dictionary of signal values, rounded and defaulted
+    """
+    signals = {}
+    for name, default in fields:
+        value = getattr(user_feature, name)
+        if not value:
+            value = default
+        elif isinstance(value, float):
+            value = round(value, 2)
+        signals[name] = value
+    return signals
+
+
+def _query_context_aggregates(db: Session, user_id: str, window_days: int) -> Dict[str, Any]:
+    """
+    Fetch the transaction- and account-derived context blocks in one statement.
+    
+    Each block is a CTE aggregated server-side into JSON (json_group_array /
+    json_object on SQLite, json_agg / json_build_object on PostgreSQL), so the
+    whole lot comes back as a single row:
+    - recent_transactions: last 10 transactions in the last 30 days
+    - recurring_merchants: top 10 merchants with 3+ transactions in the window,
+      by transaction count (highest first) then merchant name
+    - accounts: all of the user's accounts, with liability info where present
+      (one liability per account), sorted by current balance (highest first);
+      build_user_context lists high_utilization_cards in this order too
+    
+    Args:
+        db: Database session
+        user_id: User ID to aggregate for
+        window_days: Time window in days for recurring merchant detection
+    
+    Returns:
+        Dictionary keyed by block name (recent_transactions is None when empty
+        on PostgreSQL)
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        json_array_agg, json_object = func.json_agg, func.json_build_object
+    else:
+        json_array_agg, json_object = func.json_group_array, func.json_object
+    
+    today = date.today()
+    recent_cutoff = today - RECENT_TRANSACTIONS_PERIOD
+    if window_days == RECENT_TRANSACTIONS_PERIOD.days:
+        window_cutoff = recent_cutoff
+    else:
+        window_cutoff = today - timedelta(days=window_days)
+    
+    # Dates are cast to text server-side so both dialects hand back ISO
+    # "YYYY-MM-DD" strings and no per-row isoformat() is needed in Python
+    recent = (
+        select(
+            cast(Transaction.date, String).label("date"),
+            Transaction.merchant_name,
+            Transaction.amount,
+        )
+        .where(Transaction.user_id == user_id, Transaction.date >= recent_cutoff)
+        .order_by(desc(Transaction.date))
+        .limit(10)
+        .cte("recent")
+    )
+    
+    merchant_count = func.count(Transaction.transaction_id)
+    recurring = (
+        select(Transaction.merchant_name, merchant_count.label("txn_count"))
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.date >= window_cutoff,
+            Transaction.merchant_name.isnot(None),
+        )
+        .group_by(Transaction.merchant_name)
+        .having(merchant_count >= 3)
+        .order_by(desc(merchant_count), Transaction.merchant_name)
+        .limit(10)
+        .cte("recurring")
+    )
+    
+    # One liability per account (the baseline took the first match), so an
+    # account with several liability rows still appears once
+    first_liability = (
+        select(
+            Liability.account_id,
+            func.min(Liability.liability_id).label("liability_id"),
+        )
+        .where(Liability.user_id == user_id)
+        .group_by(Liability.account_id)
+        .subquery("first_liability")
+    )
+    
+    accounts = (
+        select(
+            Account.account_id,
+            Account.type,
+            Account.balance_current,
+            Account.balance_limit,
+            Liability.interest_rate,
+            Liability.minimum_payment_amount,
+        )
+        .outerjoin(first_liability, first_liability.c.account_id == Account.account_id)
+        .outerjoin(Liability, Liability.liability_id == first_liability.c.liability_id)
+        .where(Account.user_id == user_id)
+        .cte("user_accounts")
+    )
+    
+    stmt = select(
+        select(
+            json_array_agg(
+                json_object(
+                    "date", recent.c.date,
+                    "merchant", recent.c.merchant_name,
+                    "amount", recent.c.amount,
+                ),
+                type_=JSON,
+            )
+        ).scalar_subquery().label("recent_transactions"),
+        select(
+            json_array_agg(
+                json_object(
+                    "merchant", recurring.c.merchant_name,
+                    "count", recurring.c.txn_count,
+                ),
+                type_=JSON,
+            )
+        ).scalar_subquery().label("recurring_merchants"),
+        select(
+            json_array_agg(
+                json_object(
+                    "account_id", accounts.c.account_id,
+                    "type", accounts.c.type,
+                    "balance", accounts.c.balance_current,
+                    "limit", accounts.c.balance_limit,
+                    "interest_rate", accounts.c.interest_rate,
+                    "minimum_payment", accounts.c.minimum_payment_amount,
+                ),
+                type_=JSON,
+            )
+        ).scalar_subquery().label("accounts"),
+    )
+    
+    row = db.execute(stmt).one()
+    aggregates = dict(row._mapping)
+    
+    # JSON aggregates don't guarantee row order, so sort here (lists are short)
+    if aggregates["recent_transactions"]:
+        aggregates["recent_transactions"].sort(key=lambda txn: txn["date"], reverse=True)
+    aggregates["recurring_merchants"] = [
+        merchant["merchant"] for merchant in sorted(
+            aggregates["recurring_merchants"] or [],
+            key=lambda merchant: (-merchant["count"], merchant["merchant"]),
+        )
+    ]
+    aggregates["accounts"] = sorted(
+        aggregates["accounts"] or [],
+        key=lambda account: account["balance"] if account["balance"] is not None else float("-inf"),
+        reverse=True,
+    )
+    
+    return aggregates
+
+
 def build_user_context(db: Session, user_id: str, window_days: int) -> Dict[str, Any]:
     """
     Build comprehensive user context for recommendation generation.
     
     Queries:
-    - User record
+    - User existence check
     - UserFeature record for window
-    - Persona record for window
-    - Account records (top 5 by balance)
-    - Recent transactions (last 10, last 30 days)
-    - Credit card details for high utilization
-    - Recurring merchants list
-    - Savings account growth info
+    - Persona type for window
+    - One aggregate query (see _query_context_aggregates) for:
+      recent transactions, recurring merchants list, and all accounts, from
+      which the top 5 by balance, credit card details for high utilization
+      and savings account growth info are derived
     
     Args:
         db: Database session
@@ -77,9 +285,11 @@ def build_user_context(db: Session, user_id: str, window_days: int) -> Dict[str,
     Returns:
         Dictionary with complete user context
     """
-    # Query User record
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
+    # Check User record exists (column-only select, no ORM entity hydration)
+    user_exists = db.execute(
+        select(User.user_id).where(User.user_id == user_id)
+    ).first()
+    if not user_exists:
         raise ValueError(f"User {user_id} not found")
     
     # Query UserFeature record for window
@@ -90,130 +300,62 @@ def build_user_context(db: Session, user_id: str, window_days: int) -> Dict[str,
         )
     ).first()
     
-    # Query Persona record for window
-    persona = db.query(Persona).filter(
-        and_(
+    # Query Persona type for window
+    persona_type = db.execute(
+        select(Persona.persona_type).where(
             Persona.user_id == user_id,
             Persona.window_days == window_days
         )
-    ).first()
+    ).scalar()
     
     # Create base context dict
     context = {
         "user_id": user_id,
         "window_days": window_days,
-        "persona_type": persona.persona_type if persona else None,
+        "persona_type": persona_type,
     }
     
-    # Add features to context dict
+    # Add features to context dict (defaults if no features found)
+    for block, fields in CONTEXT_SIGNAL_FIELDS.items():
+        context[block] = _signal_values(user_feature, fields) if user_feature else dict(fields)
+    
     if user_feature:
-        # Subscription signals
-        context["subscription_signals"] = {
-            "recurring_merchants": user_feature.recurring_merchants or 0,
-            "monthly_recurring_spend": round(user_feature.monthly_recurring_spend or 0.0, 2),
-            "subscription_spend_share": round(user_feature.subscription_spend_share or 0.0, 2),
-        }
-        
-        # Savings signals
-        context["savings_signals"] = {
-            "net_savings_inflow": round(user_feature.net_savings_inflow or 0.0, 2),
-            "savings_growth_rate": round(user_feature.savings_growth_rate or 0.0, 2),
-            "emergency_fund_months": round(user_feature.emergency_fund_months or 0.0, 2),
-        }
-        
-        # Credit signals
-        context["credit_signals"] = {
-            "avg_utilization": round(user_feature.avg_utilization or 0.0, 2),
-            "max_utilization": round(user_feature.max_utilization or 0.0, 2),
-            "utilization_30_flag": user_feature.utilization_30_flag or False,
-            "utilization_50_flag": user_feature.utilization_50_flag or False,
-            "utilization_80_flag": user_feature.utilization_80_flag or False,
-            "minimum_payment_only_flag": user_feature.minimum_payment_only_flag or False,
-            "interest_charges_present": user_feature.interest_charges_present or False,
-            "any_overdue": user_feature.any_overdue or False,
-        }
-        
-        # Income signals
-        context["income_signals"] = {
-            "payroll_detected": user_feature.payroll_detected or False,
-            "median_pay_gap_days": user_feature.median_pay_gap_days,
-            "income_variability": round(user_feature.income_variability or 0.0, 2) if user_feature.income_variability else None,
-            "cash_flow_buffer_months": round(user_feature.cash_flow_buffer_months or 0.0, 2),
-            "avg_monthly_income": round(user_feature.avg_monthly_income or 0.0, 2),
-        }
-    else:
-        # Default values if no features found
-        context["subscription_signals"] = {
-            "recurring_merchants": 0,
-            "monthly_recurring_spend": 0.0,
-            "subscription_spend_share": 0.0,
-        }
-        context["savings_signals"] = {
-            "net_savings_inflow": 0.0,
-            "savings_growth_rate": 0.0,
-            "emergency_fund_months": 0.0,
-        }
-        context["credit_signals"] = {
-            "avg_utilization": 0.0,
-            "max_utilization": 0.0,
-            "utilization_30_flag": False,
-            "utilization_50_flag": False,
-            "utilization_80_flag": False,
-            "minimum_payment_only_flag": False,
-            "interest_charges_present": False,
-            "any_overdue": False,
-        }
-        context["income_signals"] = {
-            "payroll_detected": False,
-            "median_pay_gap_days": None,
-            "income_variability": None,
-            "cash_flow_buffer_months": 0.0,
-            "avg_monthly_income": 0.0,
-        }
+        # Pay gap is reported as-is: unlike the other signals, 0 is a real value here
+        context["income_signals"]["median_pay_gap_days"] = user_feature.median_pay_gap_days
     
-    # Query Account records for user
-    accounts = db.query(Account).filter(
-        Account.user_id == user_id
-    ).order_by(desc(Account.balance_current)).limit(5).all()
+    # Fetch all transaction/account aggregates in a single round-trip
+    aggregates = _query_context_aggregates(db, user_id, window_days)
+    accounts = aggregates["accounts"]
     
-    # Create account info dicts
+    # Create account info dicts (top 5 by balance)
     account_list = []
-    for account in accounts:
+    for account in accounts[:5]:
         # Mask account ID for privacy (show last 4 digits)
-        account_id_masked = f"****{account.account_id[-4:]}" if len(account.account_id) >= 4 else "****"
-        account_name = f"{account.type.title()} {account_id_masked}"
+        account_id_masked = f"****{account['account_id'][-4:]}" if len(account["account_id"]) >= 4 else "****"
+        account_name = f"{account['type'].title()} {account_id_masked}"
         
         account_info = {
-            "type": account.type,
+            "type": account["type"],
             "name": account_name,
-            "balance": round(account.balance_current or 0.0, 2),
+            "balance": round(account["balance"] or 0.0, 2),
         }
         
         # Add limit for credit cards
-        if account.type == "credit card" and account.balance_limit:
-            account_info["limit"] = round(account.balance_limit, 2)
+        if account["type"] == "credit card" and account["limit"]:
+            account_info["limit"] = round(account["limit"], 2)
         
         account_list.append(account_info)
     
     context["accounts"] = account_list
     
-    # Query Transaction records for user in last 30 days
-    cutoff_date = date.today() - timedelta(days=30)
-    transactions = db.query(Transaction).filter(
-        and_(
-            Transaction.user_id == user_id,
-            Transaction.date >= cutoff_date
-        )
-    ).order_by(desc(Transaction.date)).limit(10).all()
-    
     # Create transaction dicts
     transaction_list = []
-    for txn in transactions:
+    for txn in aggregates["recent_transactions"] or []:
         transaction_info = {
-            "date": txn.date.isoformat(),
-            "merchant": txn.merchant_name or "Unknown",
-            "amount": round(txn.amount, 2),
-            "type": "deposit" if txn.amount > 0 else "expense",
+            "date": txn["date"],
+            "merchant": txn["merchant"] or "Unknown",
+            "amount": round(txn["amount"], 2),
+            "type": "deposit" if txn["amount"] > 0 else "expense",
         }
         transaction_list.append(transaction_info)
     
@@ -221,92 +363,55 @@ def build_user_context(db: Session, user_id: str, window_days: int) -> Dict[str,
     
     # For credit cards with high utilization, add detailed info
     if user_feature and user_feature.max_utilization and user_feature.max_utilization >= 0.50:
-        credit_card_accounts = db.query(Account).filter(
-            and_(
-                Account.user_id == user_id,
-                Account.type == "credit card"
-            )
-        ).all()
-        
         high_utilization_cards = []
-        for account in credit_card_accounts:
-            balance = account.balance_current or 0.0
-            limit = account.balance_limit or 0.0
-            
-            if limit > 0:
-                utilization = balance / limit
-                if utilization >= 0.50:  # High utilization threshold
-                    # Get liability info if available
-                    liability = db.query(Liability).filter(
-                        and_(
-                            Liability.account_id == account.account_id,
-                            Liability.user_id == user_id
-                        )
-                    ).first()
-                    
-                    card_info = {
-                        "last_4_digits": account.account_id[-4:] if len(account.account_id) >= 4 else "****",
-                        "current_balance": round(balance, 2),
-                        "credit_limit": round(limit, 2),
-                        "utilization_percentage": round(utilization * 100, 2),
-                    }
-                    
-                    # Add interest info if available
-                    if liability:
-                        if liability.interest_rate:
-                            card_info["interest_rate"] = round(liability.interest_rate, 2)
-                        if liability.minimum_payment_amount:
-                            card_info["minimum_payment"] = round(liability.minimum_payment_amount, 2)
-                        
-                        # Estimate monthly interest charges
-                        if liability.interest_rate and balance > 0:
-                            monthly_interest = (balance * liability.interest_rate / 100) / 12
-                            card_info["estimated_monthly_interest"] = round(monthly_interest, 2)
-                    
-                    high_utilization_cards.append(card_info)
+        # Accounts come sorted by balance, so the largest balances are listed first
+        for card in accounts:
+            if card["type"] != "credit card":
+                continue
+            
+            balance = card["balance"] or 0.0
+            limit = card["limit"] or 0.0
+            if limit <= 0:
+                continue
+            
+            utilization = balance / limit
+            if utilization < 0.50:  # High utilization threshold
+                continue
+            
+            card_info = {
+                "last_4_digits": card["account_id"][-4:] if len(card["account_id"]) >= 4 else "****",
+                "current_balance": round(balance, 2),
+                "credit_limit": round(limit, 2),
+                "utilization_percentage": round(utilization * 100, 2),
+            }
+            
+            # Add interest info if available (liability columns are null without a liability)
+            if card["interest_rate"]:
+                card_info["interest_rate"] = round(card["interest_rate"], 2)
+            if card["minimum_payment"]:
+                card_info["minimum_payment"] = round(card["minimum_payment"], 2)
+            
+            # Estimate monthly interest charges
+            if card["interest_rate"] and balance > 0:
+                monthly_interest = (balance * card["interest_rate"] / 100) / 12
+                card_info["estimated_monthly_interest"] = round(monthly_interest, 2)
+            
+            high_utilization_cards.append(card_info)
         
         if high_utilization_cards:
             context["high_utilization_cards"] = high_utilization_cards
     
-    # For recurring merchants, add list of merchant names
+    # For recurring merchants, add list of merchant names (3+ transactions in window)
     if user_feature and user_feature.recurring_merchants and user_feature.recurring_merchants > 0:
-        # Get transactions in window to find recurring merchants
-        window_cutoff = date.today() - timedelta(days=window_days)
-        window_transactions = db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.date >= window_cutoff,
-                Transaction.merchant_name.isnot(None)
-            )
-        ).all()
-        
-        # Group by merchant and count occurrences
-        merchant_counts = {}
-        for txn in window_transactions:
-            merchant = txn.merchant_name
-            if merchant:
-                merchant_counts[merchant] = merchant_counts.get(merchant, 0) + 1
-        
-        # Get merchants with 3+ transactions (likely recurring)
-        recurring_merchants = [
-            merchant for merchant, count in merchant_counts.items()
-            if count >= 3
-        ]
-        
+        recurring_merchants = aggregates["recurring_merchants"]
         if recurring_merchants:
-            context["recurring_merchants"] = recurring_merchants[:10]  # Limit to top 10
+            context["recurring_merchants"] = recurring_merchants
     
     # For savings accounts, add growth trend info
     if user_feature and user_feature.savings_growth_rate:
-        savings_accounts = db.query(Account).filter(
-            and_(
-                Account.user_id == user_id,
-                Account.type.in_(["savings", "money market", "cash management", "HSA"])
-            )
-        ).all()
-        
+        savings_accounts = [acc for acc in accounts if acc["type"] in SAVINGS_ACCOUNT_TYPES]
         if savings_accounts:
-            total_savings_balance = sum(acc.balance_current or 0.0 for acc in savings_accounts)
+            total_savings_balance = sum(acc["balance"] or 0.0 for acc in savings_accounts)
             context["savings_accounts"] = {
                 "count": len(savings_accounts),
                 "total_balance": round(total_savings_balance, 2),
@@ -326,58 +431,23 @@ def validate_context(context: Dict[str, Any]) -> bool:
     """
     Validate that context dict has required fields and correct data types.
     
+    Validation runs through the UserContext schema in strict mode, so nested
+    signal dicts are type-checked as well as the top-level fields.
+    
     Args:
         context: Context dictionary to validate
     
     Returns:
         True if valid, False otherwise
     """
-    required_fields = [
-        "user_id",
-        "window_days",
-        "persona_type",
-        "subscription_signals",
-        "savings_signals",
-        "credit_signals",
-        "income_signals",
-        "accounts",
-        "recent_transactions",
-    ]
-    
-    # Check required fields present
-    for field in required_fields:
-        if field not in context:
-            logger.error(f"Missing required field in context: {field}")
-            return False
-    
-    # Check data types
-    if not isinstance(context["user_id"], str):
-        logger.error(f"Invalid user_id type: {type(context['user_id'])}")
-        return False
-    
-    if not isinstance(context["window_days"], int):
-        logger.error(f"Invalid window_days type: {type(context['window_days'])}")
-        return False
-    
-    if context["persona_type"] is not None and not isinstance(context["persona_type"], str):
-        logger.error(f"Invalid persona_type type: {type(context['persona_type'])}")
-        return False
-    
-    if not isinstance(context["accounts"], list):
-        logger.error(f"Invalid accounts type: {type(context['accounts'])}")
-        return False
-    
-    if not isinstance(context["recent_transactions"], list):
-        logger.error(f"Invalid recent_transactions type: {type(context['recent_transactions'])}")
+    try:
+        UserContext.model_validate(context, strict=True)
+    except ValidationError as e:
+        for error in e.errors():
+            field = ".".join(str(loc) for loc in error["loc"])
+            logger.error(f"Invalid context field {field}: {error['msg']}")
         return False
     
-    # Check signal dicts
-    signal_fields = ["subscription_signals", "savings_signals", "credit_signals", "income_signals"]
-    for field in signal_fields:
-        if not isinstance(context[field], dict):
-            logger.error(f"Invalid {field} type: {type(context[field])}")
-            return False
-    
     logger.debug(f"Context validation passed for user {context['user_id']}")
     return True
 
@@ -403,8 +473,8 @@ def generate_recommendations_via_openai(persona_type: str, user_context: dict) -
     # Load system prompt for persona type using prompt_loader
     system_prompt = load_prompt(persona_type)
     
-    # Convert user_context dict to JSON string
-    user_context_json = json.dumps(user_context, indent=2)
+    # Convert user_context dict to JSON string (orjson: C encoder, same indented layout)
+    user_context_json = orjson.dumps(user_context, option=orjson.OPT_INDENT_2).decode()
     
     # Record start time for latency tracking
     start_time = time.time()
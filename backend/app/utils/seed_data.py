@@ -52,6 +52,10 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
     """
     Synchronous version of ingest logic for use in seeding.
     Returns dict with ingested counts and duration_ms.
+    
+    All entity types are inserted in a single transaction with one commit at
+    the end, so a failed seed leaves the database empty (and it is retried on
+    the next startup) instead of half-populated.
     """
     start_time = time.time()
     ingested_counts = {
@@ -80,7 +84,6 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
                 user_objects.append(user_obj)
             
             db.bulk_save_objects(user_objects)
-            db.commit()
             ingested_counts["users"] = len(user_objects)
         
         # Process Accounts
@@ -102,7 +105,6 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
                 account_objects.append(account_obj)
             
             db.bulk_save_objects(account_objects)
-            db.commit()
             ingested_counts["accounts"] = len(account_objects)
         
         # Process Transactions (in batches of 1000)
@@ -132,7 +134,6 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
                     transaction_objects.append(transaction_obj)
                 
                 db.bulk_save_objects(transaction_objects)
-                db.commit()
                 total_transactions += len(transaction_objects)
             
             ingested_counts["transactions"] = total_transactions
@@ -160,9 +161,11 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
                 liability_objects.append(liability_obj)
             
             db.bulk_save_objects(liability_objects)
-            db.commit()
             ingested_counts["liabilities"] = len(liability_objects)
         
+        # Commit everything at once
+        db.commit()
+        
         duration_ms = int((time.time() - start_time) * 1000)
         ingested_counts["duration_ms"] = duration_ms
         
@@ -174,7 +177,8 @@ def _ingest_data_sync(request: IngestRequest, db: Session) -> dict:
         error_msg = str(e.orig) if hasattr(e, 'orig') else str(e)
         if "UNIQUE constraint" in error_msg or "duplicate key" in error_msg.lower():
             logger.warning(f"Duplicate data detected during seed: {error_msg}")
-            # Return what we've ingested so far
+            # The whole seed was rolled back, so nothing was ingested
+            ingested_counts = dict.fromkeys(ingested_counts, 0)
             duration_ms = int((time.time() - start_time) * 1000)
             ingested_counts["duration_ms"] = duration_ms
             return ingested_counts
@@ -6,129 +6,336 @@ Assigns personas for both 30-day and 180-day windows for all users in the databa
 """
 
 import sys
+import argparse
+import logging
 from pathlib import Path
 import time
 from datetime import datetime
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
 
 # Add backend to path (where app/ module lives)
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import SQLALCHEMY_DATABASE_URL
+from sqlalchemy import create_engine, event, case, func
+from sqlalchemy.orm import sessionmaker, scoped_session
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
 from app.models import User, Persona
-from app.services.persona_assignment import assign_and_save_persona
+from app.services.persona_assignment import assign_personas_bulk, save_personas_bulk
 
+logger = logging.getLogger(__name__)
 
-def main():
-    """Main function to assign personas for all users"""
-    # Create database session
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    db = SessionLocal()
+# Number of users assigned, saved and committed together (two persona writes each)
+COMMIT_BATCH_SIZE = 250
+
+
+def configure_error_log() -> Path:
+    """Write per-user errors to logs/batch.log so they stay off the progress bar"""
+    log_path = backend_dir / "logs" / "batch.log"
+    if logger.handlers:
+        return log_path
+    log_path.parent.mkdir(exist_ok=True)
+    handler = logging.FileHandler(log_path)
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return log_path
+
+
+def assign_batch(db, user_ids):
+    """
+    Work out 30-day and 180-day personas for a batch of users without saving them.
+    
+    Features for each window are loaded with one query for the whole batch.
+    A user that fails in either window is left out of both, so it never ends
+    up with only one window saved.
     
+    Args:
+        db: Database session
+        user_ids: Customer user IDs in the batch
+    
+    Returns:
+        Tuple of (dict mapping window_days to that window's assignments,
+        dict mapping failed user_id to its exception)
+    """
+    # Per-user caches so window-independent lookups are shared by both windows
+    ctx_by_user = {}
+    errors = {}
+    assignments = {
+        window_days: assign_personas_bulk(db, user_ids, window_days, ctx_by_user, errors=errors)
+        for window_days in (30, 180)
+    }
+    for window_assignments in assignments.values():
+        for user_id in errors:
+            window_assignments.pop(user_id, None)
+    return assignments, errors
+
+
+def assign_batch_on_thread(Session, user_ids):
+    """Run assign_batch() on the calling thread's session from the scoped registry"""
     try:
-        print("=" * 60)
-        print("Batch Persona Assignment")
-        print("=" * 60)
+        return assign_batch(Session(), user_ids)
+    finally:
+        Session.remove()
+
+
+def iter_assigned_batches(db, batches, max_workers):
+    """
+    Assign personas for each batch, yielding results as batches finish.
+    
+    With more than one worker, batches are assigned on a thread pool, each
+    worker on its own session bound to db's engine; otherwise they are
+    assigned in order on db itself.
+    
+    Args:
+        db: Database session
+        batches: Lists of user IDs
+        max_workers: Number of batches to assign concurrently
+    
+    Yields:
+        Tuples of (batch, assignments by window, failed users), as returned
+        by assign_batch()
+    """
+    if max_workers <= 1:
+        for batch in batches:
+            yield (batch, *assign_batch(db, batch))
+        return
+    
+    Session = scoped_session(sessionmaker(bind=db.get_bind()))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(assign_batch_on_thread, Session, batch): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+def count_personas(assignments):
+    """
+    Count assigned persona types and fallback assignments.
+    
+    Args:
+        assignments: Dictionary mapping user_id to (persona_type, confidence_score, reasoning)
+    
+    Returns:
+        Tuple of (Counter of persona types, number of fallback savings_builder
+        assignments, i.e. savings_builder with confidence < 0.3)
+    """
+    # Count once by (persona_type, low confidence) and derive both totals from it
+    buckets = Counter(
+        (persona_type, confidence < 0.3) for persona_type, confidence, _ in assignments.values()
+    )
+    persona_counter = Counter()
+    for (persona_type, _), count in buckets.items():
+        persona_counter[persona_type] += count
+    return persona_counter, buckets[('savings_builder', True)]
+
+
+def count_saved_personas(db):
+    """
+    Count persona types and fallback assignments already saved in the database.
+    
+    Runs a single GROUP BY over the personas table instead of reassigning.
+    
+    Returns:
+        Dict mapping window_days (30, 180) to (Counter of persona types,
+        number of fallback savings_builder assignments)
+    """
+    rows = db.query(
+        Persona.window_days,
+        Persona.persona_type,
+        func.count(Persona.persona_id),
+        func.sum(case((Persona.confidence_score < 0.3, 1), else_=0))
+    ).group_by(Persona.window_days, Persona.persona_type).all()
+    
+    persona_counters = {30: Counter(), 180: Counter()}
+    fallback_counts = {30: 0, 180: 0}
+    for window_days, persona_type, count, low_confidence_count in rows:
+        if window_days not in persona_counters:
+            continue
+        persona_counters[window_days][persona_type] = count
+        if persona_type == 'savings_builder':
+            fallback_counts[window_days] = low_confidence_count
+    return {
+        window_days: (persona_counters[window_days], fallback_counts[window_days])
+        for window_days in persona_counters
+    }
+
+
+def run(db, user_ids, report_only=False, commit=True, max_workers=4):
+    """
+    Assign 30-day and 180-day personas for the given users and print a summary.
+    
+    Users are processed in batches of COMMIT_BATCH_SIZE. A user whose
+    assignment fails is logged to logs/batch.log and skipped; the rest of
+    its batch is still saved.
+    
+    Args:
+        db: Database session
+        user_ids: Customer user IDs to process
+        report_only: Only summarize the personas already saved; do not reassign
+        commit: Commit after each batch (False leaves it to the caller)
+        max_workers: Batches to assign concurrently, each on its own session.
+            Only used when committing, since worker sessions can't see the
+            caller's uncommitted writes
+    """
+    n_users = len(user_ids)
+    error_count = 0
+    error_log_path = configure_error_log()
+    
+    print("=" * 60)
+    print("Batch Persona Assignment")
+    print("=" * 60)
+    print()
+    
+    start_time = time.time()
+    if report_only:
+        print(f"Found {n_users} users")
+        print(f"Reporting saved personas for 30-day and 180-day windows...")
         print()
         
-        # Query all users from database
-        users = db.query(User).filter(User.user_type == 'customer').all()
-        
-        if not users:
-            print("No users found in database. Please run data ingestion first.")
-            return
-        
-        print(f"Found {len(users)} users to process")
+        saved_summary = count_saved_personas(db)
+        persona_30d_counter, fallback_30d_count = saved_summary[30]
+        persona_180d_counter, fallback_180d_count = saved_summary[180]
+    else:
+        print(f"Found {n_users} users to process")
         print(f"Assigning personas for 30-day and 180-day windows...")
         print()
         
-        start_time = time.time()
-        persona_30d_counter = Counter()
-        persona_180d_counter = Counter()
-        fallback_30d_count = 0
-        fallback_180d_count = 0
+        batches = [
+            user_ids[i:i + COMMIT_BATCH_SIZE]
+            for i in range(0, n_users, COMMIT_BATCH_SIZE)
+        ]
+        assignments_30d = {}
+        assignments_180d = {}
         
-        # For each user
-        for idx, user in enumerate(users, 1):
-            try:
-                # Assign persona for 30-day window
-                persona_30d = assign_and_save_persona(db, user.user_id, 30)
-                persona_30d_counter[persona_30d.persona_type] += 1
-                # Track fallback assignments (low confidence savings_builder)
-                if persona_30d.persona_type == 'savings_builder' and persona_30d.confidence_score < 0.3:
-                    fallback_30d_count += 1
-                
-                # Assign persona for 180-day window
-                persona_180d = assign_and_save_persona(db, user.user_id, 180)
-                persona_180d_counter[persona_180d.persona_type] += 1
-                # Track fallback assignments (low confidence savings_builder)
-                if persona_180d.persona_type == 'savings_builder' and persona_180d.confidence_score < 0.3:
-                    fallback_180d_count += 1
-                
-                # Print progress (every 10 users)
-                if idx % 10 == 0:
-                    print(f"Processed {idx}/{len(users)} users...")
+        # Worker sessions can't see the caller's uncommitted writes, so only
+        # assign on threads when each batch is committed here
+        workers = max_workers if commit else 1
+        progress = tqdm(total=n_users, unit="user")
+        for batch, batch_assignments, batch_errors in iter_assigned_batches(db, batches, workers):
+            for user_id, error in batch_errors.items():
+                logger.error(f"Error processing user {user_id}", exc_info=error)
+            error_count += len(batch_errors)
             
-            except Exception as e:
-                print(f"Error processing user {user.user_id}: {e}")
-                continue
-        
-        total_duration = time.time() - start_time
-        
-        # Print summary statistics
-        print()
-        print("=" * 60)
-        print("Summary Statistics")
-        print("=" * 60)
-        print(f"Total users processed: {len(users)}")
-        print(f"Total duration: {total_duration:.2f} seconds")
-        print()
-        
-        # Persona distribution for 30d window
-        print("30-Day Window Persona Distribution:")
-        print("-" * 60)
-        for persona_type, count in sorted(persona_30d_counter.items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / len(users)) * 100
-            print(f"  {persona_type:25s}: {count:3d} ({percentage:5.1f}%)")
-        if fallback_30d_count > 0:
-            percentage = (fallback_30d_count / len(users)) * 100
-            print(f"  {'(fallback savings_builder)':25s}: {fallback_30d_count:3d} ({percentage:5.1f}%)")
-        print()
-        
-        # Persona distribution for 180d window
-        print("180-Day Window Persona Distribution:")
-        print("-" * 60)
-        for persona_type, count in sorted(persona_180d_counter.items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / len(users)) * 100
-            print(f"  {persona_type:25s}: {count:3d} ({percentage:5.1f}%)")
-        if fallback_180d_count > 0:
-            percentage = (fallback_180d_count / len(users)) * 100
-            print(f"  {'(fallback savings_builder)':25s}: {fallback_180d_count:3d} ({percentage:5.1f}%)")
-        print()
-        
-        # Verify all 5 persona types are represented
-        all_persona_types_30d = set(persona_30d_counter.keys())
-        all_persona_types_180d = set(persona_180d_counter.keys())
-        expected_types = {'high_utilization', 'variable_income', 'subscription_heavy', 'savings_builder', 'wealth_builder'}
-        
-        missing_30d = expected_types - all_persona_types_30d
-        missing_180d = expected_types - all_persona_types_180d
+            for window_days, window_assignments in batch_assignments.items():
+                save_personas_bulk(db, window_assignments, window_days, commit=False)
+            if commit:
+                db.commit()
+            
+            assignments_30d.update(batch_assignments[30])
+            assignments_180d.update(batch_assignments[180])
+            progress.update(len(batch))
+        progress.close()
         
-        if missing_30d:
-            print(f"⚠️  Warning: Missing persona types in 30d window: {', '.join(missing_30d)}")
-        if missing_180d:
-            print(f"⚠️  Warning: Missing persona types in 180d window: {', '.join(missing_180d)}")
+        persona_30d_counter, fallback_30d_count = count_personas(assignments_30d)
+        persona_180d_counter, fallback_180d_count = count_personas(assignments_180d)
+    
+    total_duration = time.time() - start_time
+    
+    # Print summary statistics
+    print()
+    print("=" * 60)
+    print("Summary Statistics")
+    print("=" * 60)
+    print(f"Total users {'reported' if report_only else 'processed'}: {n_users}")
+    print(f"Total duration: {total_duration:.2f} seconds")
+    if error_count:
+        print(f"⚠️  {error_count} user(s) failed - see {error_log_path}")
+    print()
+    
+    # Persona distribution for 30d window
+    print("30-Day Window Persona Distribution:")
+    print("-" * 60)
+    for persona_type, count in sorted(persona_30d_counter.items(), key=lambda x: x[1], reverse=True):
+        percentage = (count / n_users) * 100
+        print(f"  {persona_type:25s}: {count:3d} ({percentage:5.1f}%)")
+    if fallback_30d_count > 0:
+        percentage = (fallback_30d_count / n_users) * 100
+        print(f"  {'(fallback savings_builder)':25s}: {fallback_30d_count:3d} ({percentage:5.1f}%)")
+    print()
+    
+    # Persona distribution for 180d window
+    print("180-Day Window Persona Distribution:")
+    print("-" * 60)
+    for persona_type, count in sorted(persona_180d_counter.items(), key=lambda x: x[1], reverse=True):
+        percentage = (count / n_users) * 100
+        print(f"  {persona_type:25s}: {count:3d} ({percentage:5.1f}%)")
+    if fallback_180d_count > 0:
+        percentage = (fallback_180d_count / n_users) * 100
+        print(f"  {'(fallback savings_builder)':25s}: {fallback_180d_count:3d} ({percentage:5.1f}%)")
+    print()
+    
+    # Verify all 5 persona types are represented
+    all_persona_types_30d = set(persona_30d_counter.keys())
+    all_persona_types_180d = set(persona_180d_counter.keys())
+    expected_types = {'high_utilization', 'variable_income', 'subscription_heavy', 'savings_builder', 'wealth_builder'}
+    
+    missing_30d = expected_types - all_persona_types_30d
+    missing_180d = expected_types - all_persona_types_180d
+    
+    if missing_30d:
+        print(f"⚠️  Warning: Missing persona types in 30d window: {', '.join(missing_30d)}")
+    if missing_180d:
+        print(f"⚠️  Warning: Missing persona types in 180d window: {', '.join(missing_180d)}")
+    
+    if not missing_30d and not missing_180d:
+        print("✅ All 5 persona types are represented!")
+    
+    print()
+    print(f"✅ Persona {'report' if report_only else 'assignment'} complete!")
+    print("=" * 60)
+
+
+def main():
+    """Main function to assign personas for all users"""
+    parser = argparse.ArgumentParser(description="Assign personas for all users")
+    parser.add_argument(
+        "--report-only",
+        action="store_true",
+        help="Only summarize the personas already in the database; do not reassign"
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="Number of user batches to process concurrently (default: 4)"
+    )
+    args = parser.parse_args()
+    
+    # Create database session (pool sized so every worker gets a connection)
+    connect_args = {}
+    if "sqlite" in SQLALCHEMY_DATABASE_URL:
+        connect_args["check_same_thread"] = False
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args=connect_args,
+        pool_size=args.max_workers + 2,
+        max_overflow=args.max_workers * 2
+    )
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    
+    try:
+        # Query all customer IDs from database (only the ID column, streamed)
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(User.user_id).filter(User.user_type == 'customer').yield_per(1000)
+        ]
         
-        if not missing_30d and not missing_180d:
-            print("✅ All 5 persona types are represented!")
+        if not user_ids:
+            print("No users found in database. Please run data ingestion first.")
+            return
         
-        print()
-        print("✅ Persona assignment complete!")
-        print("=" * 60)
+        run(db, user_ids, report_only=args.report_only, max_workers=args.max_workers)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
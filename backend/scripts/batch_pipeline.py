@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Batch pipeline that runs the batch scripts on one database session.
+
+Runs, in order:
+1. compute_all_features - 30-day and 180-day features for all users
+2. assign_all_personas - 30-day and 180-day personas for all users
+3. fix_general_wellness_personas - general_wellness migration and missing persona check
+
+All stages share one engine and session and are committed together at the end,
+so a failure in any stage leaves the database untouched.
+"""
+
+import sys
+from pathlib import Path
+import time
+
+# Add backend to path (where app/ module lives)
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
+from app.models import User
+from scripts import compute_all_features, assign_all_personas, fix_general_wellness_personas
+
+
+def main():
+    """Main function to run the whole batch pipeline"""
+    # Create database session
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    
+    try:
+        # Query all customer IDs from database once for every stage
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(User.user_id).filter(User.user_type == 'customer').yield_per(1000)
+        ]
+        
+        if not user_ids:
+            print("No users found in database. Please run data ingestion first.")
+            return
+        
+        start_time = time.time()
+        compute_all_features.run(db, user_ids, commit=False)
+        print()
+        assign_all_personas.run(db, user_ids, commit=False)
+        print()
+        fix_general_wellness_personas.run(db, commit=False)
+        
+        # Single commit for the whole pipeline
+        db.commit()
+        
+        print()
+        print(f"✅ Batch pipeline complete in {time.time() - start_time:.2f} seconds")
+        
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.rollback()
+        sys.exit(1)
+    
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,80 +14,88 @@ from datetime import datetime
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.database import SQLALCHEMY_DATABASE_URL
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
 from app.models import User
-from app.services.feature_detection import compute_all_features
+from app.services.feature_detection import compute_all_features_bulk
+
+
+def run(db, user_ids, commit=True):
+    """
+    Compute 30-day and 180-day features for the given users and print a summary.
+    
+    Args:
+        db: Database session
+        user_ids: Customer user IDs to process
+        commit: Commit after each window (False leaves it to the caller)
+    """
+    n_users = len(user_ids)
+    
+    print("=" * 60)
+    print("Batch Feature Computation")
+    print("=" * 60)
+    print()
+    print(f"Found {n_users} users to process")
+    print(f"Computing features for 30-day and 180-day windows...")
+    print()
+    
+    start_time = time.time()
+    records_saved = 0
+    skipped_users = set()
+    
+    # Compute every user's features for each window in one batched pass;
+    # users whose features fail are skipped, the rest are still saved
+    for window_days in (30, 180):
+        window_start_time = time.time()
+        errors = {}
+        features_by_user = compute_all_features_bulk(db, user_ids, window_days, commit=commit, errors=errors)
+        window_duration = time.time() - window_start_time
+        records_saved += len(features_by_user)
+        skipped_users.update(errors)
+        print(f"Computed {window_days}-day features for {len(features_by_user)} users "
+              f"in {window_duration:.2f} seconds")
+    
+    total_duration = time.time() - start_time
+    
+    # Print summary statistics
+    print()
+    print("=" * 60)
+    print("Summary Statistics")
+    print("=" * 60)
+    print(f"Total users processed: {n_users}")
+    print(f"Users skipped due to errors: {len(skipped_users)}")
+    print(f"Total duration: {total_duration:.2f} seconds")
+    
+    avg_time = total_duration / n_users
+    print(f"Average computation time per user: {avg_time:.3f} seconds")
+    print(f"Total feature records created/updated: {records_saved} (30d + 180d per user)")
+    
+    print()
+    print("✅ Feature computation complete!")
+    print("=" * 60)
 
 
 def main():
     """Main function to compute features for all users"""
     # Create database session
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
     SessionLocal = sessionmaker(bind=engine)
     db = SessionLocal()
     
     try:
-        print("=" * 60)
-        print("Batch Feature Computation")
-        print("=" * 60)
-        print()
-        
-        # Query all users from database
-        users = db.query(User).filter(User.user_type == 'customer').all()
+        # Query all customer IDs from database (only the ID column, streamed)
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(User.user_id).filter(User.user_type == 'customer').yield_per(1000)
+        ]
         
-        if not users:
+        if not user_ids:
             print("No users found in database. Please run data ingestion first.")
             return
         
-        print(f"Found {len(users)} users to process")
-        print(f"Computing features for 30-day and 180-day windows...")
-        print()
-        
-        start_time = time.time()
-        total_computation_times = []
-        
-        # For each user
-        for idx, user in enumerate(users, 1):
-            user_start_time = time.time()
-            
-            try:
-                # Compute features for 30-day window
-                compute_all_features(db, user.user_id, 30)
-                
-                # Compute features for 180-day window
-                compute_all_features(db, user.user_id, 180)
-                
-                user_duration = time.time() - user_start_time
-                total_computation_times.append(user_duration)
-                
-                # Print progress (every 10 users)
-                if idx % 10 == 0:
-                    print(f"Processed {idx}/{len(users)} users...")
-            
-            except Exception as e:
-                print(f"Error processing user {user.user_id}: {e}")
-                continue
-        
-        total_duration = time.time() - start_time
-        
-        # Print summary statistics
-        print()
-        print("=" * 60)
-        print("Summary Statistics")
-        print("=" * 60)
-        print(f"Total users processed: {len(users)}")
-        print(f"Total duration: {total_duration:.2f} seconds")
-        
-        if total_computation_times:
-            avg_time = sum(total_computation_times) / len(total_computation_times)
-            print(f"Average computation time per user: {avg_time:.3f} seconds")
-            print(f"Total feature records created/updated: {len(users) * 2} (30d + 180d per user)")
-        
-        print()
-        print("✅ Feature computation complete!")
-        print("=" * 60)
+        run(db, user_ids)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -101,4 +109,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -17,131 +17,245 @@ from datetime import datetime
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine, and_
+from sqlalchemy import create_engine, event, and_, case, exists, func, select, update
 from sqlalchemy.orm import sessionmaker
-from app.database import SQLALCHEMY_DATABASE_URL
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
 from app.models import User, Persona, UserFeature
 
 
-def main():
-    """Main function to fix general_wellness personas"""
-    # Create database session
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    db = SessionLocal()
+FEATURES_REASON = 'No persona criteria matched - fallback assignment'
+NO_FEATURES_REASON = 'No features computed for this user/window - fallback assignment'
+
+
+def fallback_reasoning(reason, now_iso):
+    """Build the reasoning JSON for a persona migrated to the savings_builder fallback"""
+    return {
+        'matched_criteria': [],
+        'feature_values': {},
+        'timestamp': now_iso,
+        'reason': reason,
+        'original_persona_type': 'general_wellness',
+        'migrated_at': now_iso
+    }
+
+
+def run(db, commit=True):
+    """
+    Migrate general_wellness personas and report features without personas.
     
-    try:
-        print("=" * 60)
-        print("Fix General Wellness Personas")
-        print("=" * 60)
-        print()
+    Args:
+        db: Database session
+        commit: Commit the migration (False leaves it to the caller)
+    """
+    print("=" * 60)
+    print("Fix General Wellness Personas")
+    print("=" * 60)
+    print()
+    
+    # Step 1: Find all personas with 'general_wellness'
+    # Note: SQLite might allow old data even with new constraint
+    general_wellness_filter = Persona.persona_type == 'general_wellness'
+    general_wellness_count = db.query(Persona).filter(general_wellness_filter).count()
+    
+    print(f"Found {general_wellness_count} persona(s) with 'general_wellness' type")
+    print()
+    
+    if general_wellness_count:
+        print("Updating personas to 'savings_builder':")
+        print("-" * 60)
         
-        # Step 1: Find all personas with 'general_wellness'
-        # Note: SQLite might allow old data even with new constraint
-        # We'll query directly using raw SQL to catch any that exist
-        general_wellness_personas = db.query(Persona).filter(
-            Persona.persona_type == 'general_wellness'
-        ).all()
+        # One timestamp for the whole migration batch, and the two possible
+        # fallback reasoning payloads built (and serialized) once
+        now = datetime.now()
+        now_iso = now.isoformat()
+        reasoning_templates = {
+            reason: fallback_reasoning(reason, now_iso)
+            for reason in (FEATURES_REASON, NO_FEATURES_REASON)
+        }
+        reasoning_templates_json = {
+            reason: json.dumps(template) for reason, template in reasoning_templates.items()
+        }
         
-        print(f"Found {len(general_wellness_personas)} persona(s) with 'general_wellness' type")
-        print()
+        # Confidence and reason are chosen by whether features exist
+        has_features = exists().where(
+            and_(
+                UserFeature.user_id == Persona.user_id,
+                UserFeature.window_days == Persona.window_days
+            )
+        )
+        fallback_reasoning_json = case(
+            (has_features, reasoning_templates_json[FEATURES_REASON]),
+            else_=reasoning_templates_json[NO_FEATURES_REASON]
+        )
         
-        if general_wellness_personas:
-            print("Updating personas to 'savings_builder':")
-            print("-" * 60)
-            
-            updated_count = 0
-            for persona in general_wellness_personas:
-                # Determine confidence based on whether features exist
-                features = db.query(UserFeature).filter(
+        updated_count = 0
+        if db.get_bind().dialect.name == "sqlite":
+            # JSON1 patches existing reasoning in place: template fields are only
+            # added when missing and the migration fields always overwrite.
+            # Missing, empty, malformed or non-object reasoning gets the template
+            merged_reasoning = func.json_set(
+                func.json_insert(
+                    Persona.reasoning,
+                    '$.matched_criteria', func.json('[]'),
+                    '$.feature_values', func.json('{}'),
+                    '$.timestamp', now_iso
+                ),
+                '$.reason', case((has_features, FEATURES_REASON), else_=NO_FEATURES_REASON),
+                '$.original_persona_type', 'general_wellness',
+                '$.migrated_at', now_iso
+            )
+            new_reasoning = case(
+                (Persona.reasoning.is_(None), fallback_reasoning_json),
+                (Persona.reasoning == '{}', fallback_reasoning_json),
+                (func.json_valid(Persona.reasoning) == 0, fallback_reasoning_json),
+                (func.json_type(Persona.reasoning) != 'object', fallback_reasoning_json),
+                else_=merged_reasoning
+            )
+        else:
+            # Personas with existing reasoning need their fields merged one by one;
+            # the outer join tells us whether features exist in the same query.
+            # Plain rows are enough, so no ORM objects are loaded or tracked
+            personas_with_reasoning = db.execute(
+                select(
+                    Persona.persona_id,
+                    Persona.user_id,
+                    Persona.window_days,
+                    Persona.reasoning,
+                    UserFeature.user_id.isnot(None).label('has_features')
+                ).outerjoin(
+                    UserFeature,
                     and_(
-                        UserFeature.user_id == persona.user_id,
-                        UserFeature.window_days == persona.window_days
+                        UserFeature.user_id == Persona.user_id,
+                        UserFeature.window_days == Persona.window_days
                     )
-                ).first()
-                
-                if features:
+                ).where(
+                    general_wellness_filter,
+                    Persona.reasoning.isnot(None),
+                    Persona.reasoning != '{}'
+                )
+            )
+            
+            persona_updates = []
+            for row in personas_with_reasoning:
+                # Determine confidence based on whether features exist
+                if row.has_features:
                     # Features exist but no match - use 0.2 confidence
                     new_confidence = 0.2
-                    reason = 'No persona criteria matched - fallback assignment'
+                    reason = FEATURES_REASON
                 else:
                     # No features - use 0.1 confidence
                     new_confidence = 0.1
-                    reason = 'No features computed for this user/window - fallback assignment'
+                    reason = NO_FEATURES_REASON
                 
                 # Update reasoning JSON
                 try:
                     # Try to parse existing reasoning
-                    existing_reasoning = json.loads(persona.reasoning) if persona.reasoning else {}
+                    existing_reasoning = json.loads(row.reasoning) if row.reasoning else {}
                 except:
                     existing_reasoning = {}
                 
-                # Update reasoning with fallback info
-                updated_reasoning = {
-                    'matched_criteria': [],
-                    'feature_values': {},
-                    'timestamp': datetime.now().isoformat(),
-                    'reason': reason,
-                    'original_persona_type': 'general_wellness',
-                    'migrated_at': datetime.now().isoformat()
-                }
-                # Preserve any existing fields
-                updated_reasoning.update(existing_reasoning)
-                updated_reasoning['reason'] = reason
-                updated_reasoning['original_persona_type'] = 'general_wellness'
-                updated_reasoning['migrated_at'] = datetime.now().isoformat()
+                # Update reasoning with fallback info, preserving any existing
+                # fields; with nothing to merge the cached template is used as is
+                if existing_reasoning:
+                    updated_reasoning = {
+                        **reasoning_templates[reason],
+                        **existing_reasoning,
+                        'reason': reason,
+                        'original_persona_type': 'general_wellness',
+                        'migrated_at': now_iso
+                    }
+                    reasoning_json = json.dumps(updated_reasoning)
+                else:
+                    reasoning_json = reasoning_templates_json[reason]
                 
-                # Update persona
-                persona.persona_type = 'savings_builder'
-                persona.confidence_score = new_confidence
-                persona.reasoning = json.dumps(updated_reasoning)
-                persona.assigned_at = datetime.now()
+                persona_updates.append({
+                    'persona_id': row.persona_id,
+                    'persona_type': 'savings_builder',
+                    'confidence_score': new_confidence,
+                    'reasoning': reasoning_json,
+                    'assigned_at': now
+                })
                 
-                print(f"  User {persona.user_id}, window {persona.window_days}d:")
-                print(f"    {persona.persona_id}: 'general_wellness' → 'savings_builder' (confidence: {new_confidence})")
-                updated_count += 1
-            
-            # Commit all updates
-            db.commit()
-            print()
-            print(f"✅ Updated {updated_count} persona(s)")
-        else:
-            print("✅ No 'general_wellness' personas found in database")
-        
-        print()
-        
-        # Step 2: Check for users with features but no personas (edge case)
-        print("Checking for users with features but no personas:")
-        print("-" * 60)
-        
-        # Get all users with features
-        users_with_features = db.query(UserFeature.user_id, UserFeature.window_days).distinct().all()
-        
-        missing_personas = []
-        for user_id, window_days in users_with_features:
-            persona = db.query(Persona).filter(
-                and_(
-                    Persona.user_id == user_id,
-                    Persona.window_days == window_days
-                )
-            ).first()
+                print(f"  User {row.user_id}, window {row.window_days}d:")
+                print(f"    {row.persona_id}: 'general_wellness' → 'savings_builder' (confidence: {new_confidence})")
             
-            if not persona:
-                missing_personas.append((user_id, window_days))
+            # Bulk UPDATE by primary key, executed as one executemany
+            if persona_updates:
+                db.execute(update(Persona), persona_updates)
+            updated_count += len(persona_updates)
+            new_reasoning = fallback_reasoning_json
         
-        if missing_personas:
-            print(f"⚠️  Found {len(missing_personas)} user/window combinations with features but no persona:")
-            for user_id, window_days in missing_personas:
-                print(f"  User {user_id}, window {window_days}d")
-            print()
-            print("These should be assigned personas. Run assign_all_personas.py to fix.")
-        else:
-            print("✅ All users with features have personas assigned")
+        # Everything still general_wellness is updated in one statement
+        bulk_count = db.query(Persona).filter(general_wellness_filter).update(
+            {
+                Persona.persona_type: 'savings_builder',
+                Persona.confidence_score: case((has_features, 0.2), else_=0.1),
+                Persona.reasoning: new_reasoning,
+                Persona.assigned_at: now
+            },
+            synchronize_session=False
+        )
+        if bulk_count:
+            print(f"  {bulk_count} persona(s): 'general_wellness' → 'savings_builder'")
+        updated_count += bulk_count
         
+        # Commit all updates
+        if commit:
+            db.commit()
         print()
-        print("=" * 60)
-        print("Fix complete!")
-        print("=" * 60)
+        print(f"✅ Updated {updated_count} persona(s)")
+    else:
+        print("✅ No 'general_wellness' personas found in database")
+    
+    print()
+    
+    # Step 2: Check for users with features but no personas (edge case)
+    print("Checking for users with features but no personas:")
+    print("-" * 60)
+    
+    # User/windows with features and no matching persona, in one anti-join;
+    # streamed so the result set is never materialized as a list
+    missing_personas_query = select(UserFeature.user_id, UserFeature.window_days).outerjoin(
+        Persona,
+        and_(
+            Persona.user_id == UserFeature.user_id,
+            Persona.window_days == UserFeature.window_days
+        )
+    ).where(Persona.persona_id.is_(None)).distinct().execution_options(
+        stream_results=True,
+        yield_per=1000
+    )
+    
+    missing_count = 0
+    for user_id, window_days in db.execute(missing_personas_query):
+        if not missing_count:
+            print("⚠️  User/window combinations with features but no persona:")
+        print(f"  User {user_id}, window {window_days}d")
+        missing_count += 1
+    
+    if missing_count:
+        print()
+        print(f"⚠️  Found {missing_count} user/window combinations with features but no persona")
+        print("These should be assigned personas. Run assign_all_personas.py to fix.")
+    else:
+        print("✅ All users with features have personas assigned")
+    
+    print()
+    print("=" * 60)
+    print("Fix complete!")
+    print("=" * 60)
+
+
+def main():
+    """Main function to fix general_wellness personas"""
+    # Create database session
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    
+    try:
+        run(db)
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
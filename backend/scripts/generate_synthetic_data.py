@@ -24,65 +24,201 @@ Output Files:
 - backend/data/synthetic_transactions.json: Transaction records
 - backend/data/synthetic_liabilities.json: Credit card liability records
 """
-import json
-import random
-import uuid
+import orjson
+import os
+from collections import Counter, defaultdict
+from functools import lru_cache
 from datetime import datetime, timedelta
 from pathlib import Path
-from faker import Faker
+import numpy as np
 
-# Set random seed for reproducibility
-random.seed(42)
 
-# Initialize Faker instance
-fake = Faker()
+class BatchedRandom:
+    """
+    random-module style scalar draws served from batches of a NumPy Generator.
+    
+    Uniforms are drawn batch_size at a time in one C call, so the scalar draws
+    in the user/account/liability generators come from the same seeded stream
+    as the vectorized transaction draws.
+    """
+    
+    def __init__(self, generator, batch_size=4096):
+        self._generator = generator
+        self._batch_size = batch_size
+        self._batch = []
+        self._pos = 0
+    
+    def random(self):
+        """Return the next float in [0, 1)"""
+        if self._pos == len(self._batch):
+            self._batch = self._generator.random(self._batch_size).tolist()
+            self._pos = 0
+        value = self._batch[self._pos]
+        self._pos += 1
+        return value
+    
+    def randint(self, a, b):
+        """Return a random integer in [a, b]"""
+        return a + int(self.random() * (b - a + 1))
+    
+    def uniform(self, a, b):
+        """Return a random float between a and b"""
+        return a + (b - a) * self.random()
+    
+    def choice(self, seq):
+        """Return a random element of a non-empty sequence"""
+        return seq[int(self.random() * len(seq))]
+
+
+# Single seeded generator for reproducibility: vectorized draws use rng
+# directly, scalar draws go through its batched wrapper
+rng = np.random.default_rng(42)
+rand = BatchedRandom(rng)
+
+# Define merchant categories with sample merchants
+MERCHANT_CATEGORIES = {
+    'groceries': ['Whole Foods', 'Trader Joe\'s', 'Safeway', 'Kroger'],
+    'subscriptions': ['Netflix', 'Spotify', 'Adobe', 'GitHub', 'Peloton', 'Apple', 'Amazon Prime'],
+    'restaurants': ['Chipotle', 'Starbucks', 'McDonald\'s', 'Local Restaurant'],
+    'gas': ['Shell', 'Chevron', 'BP'],
+    'utilities': ['PG&E', 'AT&T', 'Comcast'],
+    'shopping': ['Amazon', 'Target', 'Walmart', 'Best Buy'],
+    'payroll': []  # Will be generated dynamically with employer names
+}
+
+# Expense categories as parallel columns indexed by category ID, so a drawn
+# ID selects every attribute by position. 'other' has no merchant list; its
+# merchant names come from a pool of Faker company names
+EXPENSE_CATEGORY_PRIMARY = (
+    'groceries', 'restaurants', 'gas', 'utilities', 'shopping', 'subscriptions', 'other'
+)
+EXPENSE_CATEGORY_DETAILED = (
+    'grocery_store', 'restaurant', 'gas_station', 'utility_bill', 'retail', 'recurring_subscription', 'general'
+)
+EXPENSE_MERCHANTS = tuple(MERCHANT_CATEGORIES.get(category, []) for category in EXPENSE_CATEGORY_PRIMARY)
+EXPENSE_MERCHANT_COUNTS = np.array([len(merchants) for merchants in EXPENSE_MERCHANTS])
+EXPENSE_AMOUNT_LO = np.array([30, 10, 30, 50, 20, 5, 10])
+EXPENSE_AMOUNT_HI = np.array([200, 80, 80, 300, 500, 50, 200])
+
+# Number of distinct company names used for employers and 'other' merchants
+COMPANY_POOL_SIZE = 500
+
+# Cumulative selection weights for the expense categories (25%, 20%, 10%, 8%,
+# 15%, 12%, 10%); a roll in [0, 1) maps to a category with one binary search
+EXPENSE_CATEGORY_CDF = np.array([0.25, 0.45, 0.55, 0.63, 0.78, 0.90, 1.0])
+
+
+@lru_cache(maxsize=None)
+def _get_fake():
+    """
+    Create the shared Faker instance on first use.
+    
+    Faker is imported here so importing this module (e.g. for its helpers)
+    does not pay Faker's provider setup. Uniform sampling skips Faker's
+    frequency-weighted element picks, which dominate generation time (names
+    still come from the same word lists).
+    """
+    from faker import Faker
+    return Faker(use_weighting=False)
 
 
-def generate_users(count=75):
+def _id_batch(prefix, n):
+    """
+    Generate n random IDs with one os.urandom() call.
+    
+    Args:
+        prefix: ID prefix (e.g. 'txn')
+        n: Number of IDs to generate
+    
+    Returns:
+        List of '<prefix>_<32 hex chars>' strings
+    """
+    buf = os.urandom(16 * n)
+    return [f'{prefix}_{buf[i * 16:(i + 1) * 16].hex()}' for i in range(n)]
+
+
+def _uniform_2dp(low, high):
+    """
+    Draw a uniform value in [low, high] with two decimal places.
+    
+    Samples integer hundredths (cents) and divides once, instead of rounding
+    a random float.
+    
+    Args:
+        low: Lower bound
+        high: Upper bound
+    
+    Returns:
+        Float with at most two decimal places
+    """
+    return rand.randint(round(low * 100), round(high * 100)) / 100
+
+
+@lru_cache(maxsize=None)
+def _days_ago_iso(now, max_days=180):
+    """
+    Build the ISO timestamps for 0..max_days days before now.
+    
+    Record dates are whole-day offsets from now, so indexing this list by the
+    drawn offset replaces a datetime allocation and isoformat() per record.
+    
+    Args:
+        now: Reference datetime
+        max_days: Largest offset in days (default: 180)
+    
+    Returns:
+        List where item d is (now - d days).isoformat(); cached per reference
+        time, so generators sharing one now share one table (do not mutate)
+    """
+    return [(now - timedelta(days=days_ago)).isoformat() for days_ago in range(max_days + 1)]
+
+
+def generate_users(count=75, now=None):
     """
     Generate synthetic user data.
     
     Args:
         count: Total number of users to generate (default: 75)
+        now: Reference time for generated dates (default: current time)
     
     Returns:
         List of user dictionaries
     """
     users = []
-    emails = set()  # Track emails to ensure uniqueness
+    fake = _get_fake()
     
     # Calculate date range (6 months ago to now)
-    now = datetime.now()
+    now = now or datetime.now()
     six_months_ago = now - timedelta(days=180)
+    days_ago_iso = _days_ago_iso(now)
     
     # Generate 71 customers (95%) and 4 operators (5%)
     num_customers = 71
     num_operators = 4
     
+    user_ids = _id_batch('usr', num_customers + num_operators)
+    
     # Generate customers
     for i in range(num_customers):
-        # Generate unique email
-        email = fake.email()
-        while email in emails:
-            email = fake.email()
-        emails.add(email)
+        # Generate unique email (the user index makes it unique, no retries)
+        email = f"{fake.user_name()}+{i}@{fake.free_email_domain()}"
         
         # Generate created_at (random date in last 6 months)
-        days_ago = random.randint(0, 180)
-        created_at = (now - timedelta(days=days_ago)).isoformat()
+        days_ago = rand.randint(0, 180)
+        created_at = days_ago_iso[days_ago]
         
         # Generate consent_status (30% True, 70% False)
-        consent_status = random.random() < 0.3
+        consent_status = rand.random() < 0.3
         
         # Generate consent_granted_at if consent_status is True
         consent_granted_at = None
         if consent_status:
             # Random recent date (within last 30 days)
-            days_ago_consent = random.randint(0, 30)
-            consent_granted_at = (now - timedelta(days=days_ago_consent)).isoformat()
+            days_ago_consent = rand.randint(0, 30)
+            consent_granted_at = days_ago_iso[days_ago_consent]
         
         user = {
-            'user_id': f'usr_{uuid.uuid4()}',
+            'user_id': user_ids[i],
             'full_name': fake.name(),
             'email': email,
             'created_at': created_at,
@@ -94,28 +230,25 @@ def generate_users(count=75):
     
     # Generate operators
     for i in range(num_operators):
-        # Generate unique email
-        email = fake.email()
-        while email in emails:
-            email = fake.email()
-        emails.add(email)
+        # Generate unique email (the user index makes it unique, no retries)
+        email = f"{fake.user_name()}+{num_customers + i}@{fake.free_email_domain()}"
         
         # Generate created_at (random date in last 6 months)
-        days_ago = random.randint(0, 180)
-        created_at = (now - timedelta(days=days_ago)).isoformat()
+        days_ago = rand.randint(0, 180)
+        created_at = days_ago_iso[days_ago]
         
         # Generate consent_status (30% True, 70% False)
-        consent_status = random.random() < 0.3
+        consent_status = rand.random() < 0.3
         
         # Generate consent_granted_at if consent_status is True
         consent_granted_at = None
         if consent_status:
             # Random recent date (within last 30 days)
-            days_ago_consent = random.randint(0, 30)
-            consent_granted_at = (now - timedelta(days=days_ago_consent)).isoformat()
+            days_ago_consent = rand.randint(0, 30)
+            consent_granted_at = days_ago_iso[days_ago_consent]
         
         user = {
-            'user_id': f'usr_{uuid.uuid4()}',
+            'user_id': user_ids[num_customers + i],
             'full_name': fake.name(),
             'email': email,
             'created_at': created_at,
@@ -128,18 +261,20 @@ def generate_users(count=75):
     return users
 
 
-def generate_accounts(users):
+def generate_accounts(users, now=None):
     """
     Generate synthetic account data for users.
     
     Args:
         users: List of user dictionaries
+        now: Reference time for generated dates (default: current time)
     
     Returns:
         List of account dictionaries
     """
     accounts = []
-    now = datetime.now()
+    now = now or datetime.now()
+    days_ago_iso = _days_ago_iso(now)
     
     # Account type definitions with subtypes
     account_types = {
@@ -153,24 +288,23 @@ def generate_accounts(users):
     
     for user in users:
         user_id = user['user_id']
-        user_accounts = []
         
         # Determine if user is high-income (for investment account probability)
         # We'll use a simple heuristic: random 20% of users are "high-income"
-        is_high_income = random.random() < 0.2
+        is_high_income = rand.random() < 0.2
         
         # 1-2 checking accounts (100% of users)
-        num_checking = random.randint(1, 2)
+        num_checking = rand.randint(1, 2)
         for i in range(num_checking):
-            subtype = random.choice(account_types['checking'])
-            days_ago = random.randint(0, 180)
-            created_at = (now - timedelta(days=days_ago)).isoformat()
+            subtype = rand.choice(account_types['checking'])
+            days_ago = rand.randint(0, 180)
+            created_at = days_ago_iso[days_ago]
             
             # Realistic checking balance: $500-$10,000
-            balance = round(random.uniform(500, 10000), 2)
+            balance = _uniform_2dp(500, 10000)
             
             account = {
-                'account_id': f'acc_{uuid.uuid4()}',
+                'account_id': None,  # Filled in below
                 'user_id': user_id,
                 'type': 'checking',
                 'subtype': subtype,
@@ -181,19 +315,19 @@ def generate_accounts(users):
                 'holder_category': 'personal',
                 'created_at': created_at
             }
-            user_accounts.append(account)
+            accounts.append(account)
         
         # 0-1 savings account (60% probability)
-        if random.random() < 0.6:
-            subtype = random.choice(account_types['savings'])
-            days_ago = random.randint(0, 180)
-            created_at = (now - timedelta(days=days_ago)).isoformat()
+        if rand.random() < 0.6:
+            subtype = rand.choice(account_types['savings'])
+            days_ago = rand.randint(0, 180)
+            created_at = days_ago_iso[days_ago]
             
             # Realistic savings balance: $1,000-$50,000
-            balance = round(random.uniform(1000, 50000), 2)
+            balance = _uniform_2dp(1000, 50000)
             
             account = {
-                'account_id': f'acc_{uuid.uuid4()}',
+                'account_id': None,  # Filled in below
                 'user_id': user_id,
                 'type': 'savings',
                 'subtype': subtype,
@@ -204,26 +338,26 @@ def generate_accounts(users):
                 'holder_category': 'personal',
                 'created_at': created_at
             }
-            user_accounts.append(account)
+            accounts.append(account)
         
         # 0-2 credit cards (80% probability, varied limits $1k-$50k)
-        if random.random() < 0.8:
-            num_credit_cards = random.randint(1, 2)
+        if rand.random() < 0.8:
+            num_credit_cards = rand.randint(1, 2)
             for i in range(num_credit_cards):
-                subtype = random.choice(account_types['credit card'])
-                days_ago = random.randint(0, 180)
-                created_at = (now - timedelta(days=days_ago)).isoformat()
+                subtype = rand.choice(account_types['credit card'])
+                days_ago = rand.randint(0, 180)
+                created_at = days_ago_iso[days_ago]
                 
                 # Credit limit: $1k-$50k
-                balance_limit = round(random.uniform(1000, 50000), 2)
+                balance_limit = _uniform_2dp(1000, 50000)
                 
                 # Current balance: 0-80% of limit (varied utilization)
-                utilization = random.uniform(0, 0.8)
+                utilization = rand.uniform(0, 0.8)
                 balance_current = round(balance_limit * utilization, 2)
                 balance_available = round(balance_limit - balance_current, 2)
                 
                 account = {
-                    'account_id': f'acc_{uuid.uuid4()}',
+                    'account_id': None,  # Filled in below
                     'user_id': user_id,
                     'type': 'credit card',
                     'subtype': subtype,
@@ -234,34 +368,34 @@ def generate_accounts(users):
                     'holder_category': 'personal',
                     'created_at': created_at
                 }
-                user_accounts.append(account)
+                accounts.append(account)
         
         # 0-1 investment account (30% probability, higher for high-income users)
         investment_probability = 0.5 if is_high_income else 0.3
-        if random.random() < investment_probability:
+        if rand.random() < investment_probability:
             # Choose investment type: brokerage (60%), 401k (30%), ira (10%)
-            investment_type_roll = random.random()
+            investment_type_roll = rand.random()
             if investment_type_roll < 0.6:
                 account_type = 'brokerage'
-                subtype = random.choice(account_types['brokerage'])
+                subtype = rand.choice(account_types['brokerage'])
                 # Brokerage balance: $5k-$200k
-                balance = round(random.uniform(5000, 200000), 2)
+                balance = _uniform_2dp(5000, 200000)
             elif investment_type_roll < 0.9:
                 account_type = '401k'
-                subtype = random.choice(account_types['401k'])
+                subtype = rand.choice(account_types['401k'])
                 # 401k balance: $10k-$500k
-                balance = round(random.uniform(10000, 500000), 2)
+                balance = _uniform_2dp(10000, 500000)
             else:
                 account_type = 'ira'
-                subtype = random.choice(account_types['ira'])
+                subtype = rand.choice(account_types['ira'])
                 # IRA balance: $5k-$300k
-                balance = round(random.uniform(5000, 300000), 2)
+                balance = _uniform_2dp(5000, 300000)
             
-            days_ago = random.randint(0, 180)
-            created_at = (now - timedelta(days=days_ago)).isoformat()
+            days_ago = rand.randint(0, 180)
+            created_at = days_ago_iso[days_ago]
             
             account = {
-                'account_id': f'acc_{uuid.uuid4()}',
+                'account_id': None,  # Filled in below
                 'user_id': user_id,
                 'type': account_type,
                 'subtype': subtype,
@@ -272,61 +406,73 @@ def generate_accounts(users):
                 'holder_category': 'personal',
                 'created_at': created_at
             }
-            user_accounts.append(account)
-        
-        accounts.extend(user_accounts)
+            accounts.append(account)
+    
+    # Assign IDs in one batch now that the number of accounts is known
+    for account, account_id in zip(accounts, _id_batch('acc', len(accounts))):
+        account['account_id'] = account_id
     
     return accounts
 
 
-def generate_transactions(users, accounts):
+def generate_transactions(users, accounts, now=None):
     """
     Generate synthetic transaction data for users and accounts.
     
     Args:
         users: List of user dictionaries
         accounts: List of account dictionaries
+        now: Reference time for generated dates (default: current time)
     
     Returns:
         List of transaction dictionaries
     """
-    transactions = []
-    now = datetime.now()
+    return list(iter_transactions(users, accounts, now))
+
+
+def iter_transactions(users, accounts, now=None):
+    """
+    Generate synthetic transaction data for users and accounts, one record at a time.
+    
+    Args:
+        users: List of user dictionaries
+        accounts: List of account dictionaries
+        now: Reference time for generated dates (default: current time)
+    
+    Yields:
+        Transaction dictionaries
+    """
+    fake = _get_fake()
+    now = now or datetime.now()
     start_date = now - timedelta(days=180)
     
-    # Define merchant categories with sample merchants
-    merchant_categories = {
-        'groceries': ['Whole Foods', 'Trader Joe\'s', 'Safeway', 'Kroger'],
-        'subscriptions': ['Netflix', 'Spotify', 'Adobe', 'GitHub', 'Peloton', 'Apple', 'Amazon Prime'],
-        'restaurants': ['Chipotle', 'Starbucks', 'McDonald\'s', 'Local Restaurant'],
-        'gas': ['Shell', 'Chevron', 'BP'],
-        'utilities': ['PG&E', 'AT&T', 'Comcast'],
-        'shopping': ['Amazon', 'Target', 'Walmart', 'Best Buy'],
-        'payroll': []  # Will be generated dynamically with employer names
+    # Bucket each user's accounts by type in one pass
+    accounts_by_user = defaultdict(lambda: {'all': [], 'credit card': [], 'checking': [], 'savings': []})
+    for account in accounts:
+        buckets = accounts_by_user[account['user_id']]
+        buckets['all'].append(account)
+        if account['type'] in buckets:
+            buckets[account['type']].append(account)
+    
+    # Income deposits for each persona pattern that has them:
+    # (chance per transaction, deposit kind, min amount, max amount)
+    income_patterns = {
+        'regular_biweekly_income': (0.1, 'payroll', 2000, 6000),  # Biweekly payroll
+        'irregular_income': (0.05, 'payroll', 1500, 8000),  # Irregular, more variable payroll
+        'regular_savings': (0.03, 'savings_deposit', 200, 500)  # Only for savings accounts
     }
+    expense_channels = ['online', 'in store', 'ACH']
     
-    # Create account lookup by user_id
-    accounts_by_user = {}
-    credit_cards_by_user = {}
-    checking_accounts_by_user = {}
-    savings_accounts_by_user = {}
+    # Every transaction falls on one of the 181 days in the window, so the
+    # dates and their ISO strings are built once instead of per transaction
+    window_dates = [start_date + timedelta(days=offset) for offset in range(181)]
+    window_date_strings = [(d.date().isoformat(), d.isoformat()) for d in window_dates]
+    subscription_channels = ['online', 'ACH']
     
-    for account in accounts:
-        user_id = account['user_id']
-        if user_id not in accounts_by_user:
-            accounts_by_user[user_id] = []
-            credit_cards_by_user[user_id] = []
-            checking_accounts_by_user[user_id] = []
-            savings_accounts_by_user[user_id] = []
-        
-        accounts_by_user[user_id].append(account)
-        
-        if account['type'] == 'credit card':
-            credit_cards_by_user[user_id].append(account)
-        elif account['type'] == 'checking':
-            checking_accounts_by_user[user_id].append(account)
-        elif account['type'] == 'savings':
-            savings_accounts_by_user[user_id].append(account)
+    # Company names for payroll employers and 'other' merchants come from a
+    # pool generated once; fake.company() is Faker's slowest call here
+    company_pool = [fake.company() for _ in range(COMPANY_POOL_SIZE)]
+    subscription_merchants = MERCHANT_CATEGORIES['subscriptions']
     
     # Assign persona patterns to users
     # We'll create variety in transaction patterns
@@ -335,13 +481,14 @@ def generate_transactions(users, accounts):
             continue  # Skip operators
         
         user_id = user['user_id']
-        user_accounts = accounts_by_user.get(user_id, [])
+        buckets = accounts_by_user.get(user_id)
         
-        if not user_accounts:
+        if not buckets:
             continue
+        user_accounts = buckets['all']
         
         # Assign persona pattern (randomly distributed)
-        persona_pattern = random.choice([
+        persona_pattern = rand.choice([
             'high_credit_usage',
             'recurring_subscriptions',
             'regular_savings',
@@ -351,79 +498,90 @@ def generate_transactions(users, accounts):
         ])
         
         # Generate 150-300 transactions per user
-        num_transactions = random.randint(150, 300)
+        num_transactions = rand.randint(150, 300)
+        
+        # Account preference for this user's pattern: a transaction uses the
+        # preferred accounts with the given probability, otherwise the others
+        if persona_pattern == 'high_credit_usage' and buckets['credit card']:
+            # Prefer credit cards
+            preferred_accounts, preferred_share, other_accounts = buckets['credit card'], 0.7, user_accounts
+        elif persona_pattern == 'regular_savings' and buckets['savings']:
+            # Mix of checking and savings
+            preferred_accounts, preferred_share, other_accounts = buckets['savings'], 0.3, buckets['checking']
+        else:
+            # Default: prefer checking accounts
+            preferred_accounts, preferred_share, other_accounts = None, 0, buckets['checking'] or user_accounts
+        
+        # Income and subscription behaviour for this user's pattern
+        income_probability, income_kind, income_low, income_high = income_patterns.get(
+            persona_pattern, (0, None, 0, 0)
+        )
+        has_subscription_pattern = persona_pattern == 'recurring_subscriptions'
         
         # Track recurring merchants for subscription pattern
         recurring_merchants = {}
         
-        # Track payroll dates for income patterns
-        payroll_dates = []
+        # Pre-generate this user's transaction and merchant entity IDs
+        transaction_ids = _id_batch('txn', num_transactions)
+        merchant_entity_ids = _id_batch('merchant', num_transactions)
+        
+        # Draw every random value for this user's transactions up front, so the
+        # loop below only picks values out of plain lists
+        n = num_transactions
+        days_offsets = rng.integers(0, 181, size=n).tolist()
+        uses_preferred = (rng.random(n) < preferred_share).tolist()
+        account_picks = rng.random(n).tolist()
+        income_mask = (rng.random(n) < income_probability).tolist()
+        income_amounts = (rng.integers(income_low * 100, income_high * 100, size=n, endpoint=True) / 100).tolist()
+        subscription_mask = (rng.random(n) < 0.3).tolist()
+        subscription_merchant_idx = rng.integers(0, len(subscription_merchants), size=n).tolist()
+        subscription_amounts = (rng.integers(500, 5000, size=n, endpoint=True) / 100).tolist()
+        subscription_channel_idx = rng.integers(0, len(subscription_channels), size=n).tolist()
+        category_idx = np.searchsorted(EXPENSE_CATEGORY_CDF, rng.random(n))
+        expense_amounts = (rng.integers(
+            EXPENSE_AMOUNT_LO[category_idx] * 100, EXPENSE_AMOUNT_HI[category_idx] * 100, endpoint=True
+        ) / 100).tolist()
+        merchant_idx = (rng.random(n) * EXPENSE_MERCHANT_COUNTS[category_idx]).astype(int).tolist()
+        category_idx = category_idx.tolist()
+        expense_channel_idx = rng.integers(0, len(expense_channels), size=n).tolist()
+        pending_flags = (rng.random(n) < 0.05).tolist()  # 5% pending
+        company_idx = rng.integers(0, COMPANY_POOL_SIZE, size=n).tolist()
         
         # Generate transactions
         for i in range(num_transactions):
             # Random date within 180-day window
-            days_offset = random.randint(0, 180)
-            transaction_date = start_date + timedelta(days=days_offset)
+            transaction_date = window_dates[days_offsets[i]]
+            transaction_day, transaction_created_at = window_date_strings[days_offsets[i]]
             
             # Select account based on persona pattern
-            if persona_pattern == 'high_credit_usage' and credit_cards_by_user.get(user_id):
-                # Prefer credit cards
-                account = random.choice(credit_cards_by_user[user_id]) if random.random() < 0.7 else random.choice(user_accounts)
-            elif persona_pattern == 'regular_savings' and savings_accounts_by_user.get(user_id):
-                # Mix of checking and savings
-                account = random.choice(savings_accounts_by_user[user_id]) if random.random() < 0.3 else random.choice(checking_accounts_by_user[user_id])
-            else:
-                # Default: prefer checking accounts
-                if checking_accounts_by_user.get(user_id):
-                    account = random.choice(checking_accounts_by_user[user_id])
-                else:
-                    account = random.choice(user_accounts)
+            candidates = preferred_accounts if uses_preferred[i] else other_accounts
+            account = candidates[int(account_picks[i] * len(candidates))]
             
             # Determine transaction type (expense or income)
             is_income = False
             
-            # Handle payroll deposits
-            if persona_pattern == 'regular_biweekly_income':
-                # Generate biweekly payroll (every 14 days)
-                if not payroll_dates:
-                    # First payroll date
-                    first_payroll = start_date + timedelta(days=random.randint(0, 13))
-                    payroll_dates.append(first_payroll)
-                
-                # Check if we should add a payroll transaction
-                if random.random() < 0.1:  # ~10% chance per transaction
+            # Handle income deposits (payroll or savings transfers)
+            if income_mask[i]:
+                if income_kind == 'payroll':
                     is_income = True
-                    employer_name = fake.company()
+                    employer_name = company_pool[company_idx[i]]
                     merchant_name = f"PAYROLL DEPOSIT - {employer_name}"
                     category_primary = 'income'
                     category_detailed = 'payroll'
-                    amount = round(random.uniform(2000, 6000), 2)
-                    payment_channel = 'ACH'
-            elif persona_pattern == 'irregular_income':
-                # Irregular payroll deposits
-                if random.random() < 0.05:  # ~5% chance per transaction
-                    is_income = True
-                    employer_name = fake.company()
-                    merchant_name = f"PAYROLL DEPOSIT - {employer_name}"
-                    category_primary = 'income'
-                    category_detailed = 'payroll'
-                    amount = round(random.uniform(1500, 8000), 2)  # More variable
-                    payment_channel = 'ACH'
-            elif persona_pattern == 'regular_savings':
-                # Regular savings deposits
-                if random.random() < 0.03 and account['type'] == 'savings':  # ~3% chance, only for savings accounts
+                elif account['type'] == 'savings':
                     is_income = True
                     merchant_name = "TRANSFER FROM CHECKING"
                     category_primary = 'transfer'
                     category_detailed = 'savings_deposit'
-                    amount = round(random.uniform(200, 500), 2)
+                if is_income:
+                    amount = income_amounts[i]
                     payment_channel = 'ACH'
             
             # Handle recurring subscriptions
-            if persona_pattern == 'recurring_subscriptions' and not is_income:
+            if has_subscription_pattern and not is_income:
                 # 30% chance of subscription transaction
-                if random.random() < 0.3:
-                    merchant_name = random.choice(merchant_categories['subscriptions'])
+                if subscription_mask[i]:
+                    merchant_name = subscription_merchants[subscription_merchant_idx[i]]
                     category_primary = 'subscriptions'
                     category_detailed = 'recurring_subscription'
                     
@@ -432,105 +590,56 @@ def generate_transactions(users, accounts):
                         recurring_merchants[merchant_name] = []
                     recurring_merchants[merchant_name].append(transaction_date)
                     
-                    amount = round(random.uniform(5, 50), 2)
-                    payment_channel = random.choice(['online', 'ACH'])
+                    amount = subscription_amounts[i]
+                    payment_channel = subscription_channels[subscription_channel_idx[i]]
             
             # Generate regular expense transactions
             if not is_income:
-                # Select category
-                category_weights = {
-                    'groceries': 0.25,
-                    'restaurants': 0.20,
-                    'gas': 0.10,
-                    'utilities': 0.08,
-                    'shopping': 0.15,
-                    'subscriptions': 0.12,
-                    'other': 0.10
-                }
-                
-                category_roll = random.random()
-                cumulative = 0
-                selected_category = 'other'
-                
-                for cat, weight in category_weights.items():
-                    cumulative += weight
-                    if category_roll <= cumulative:
-                        selected_category = cat
-                        break
-                
-                if selected_category == 'groceries':
-                    merchant_name = random.choice(merchant_categories['groceries'])
-                    category_primary = 'groceries'
-                    category_detailed = 'grocery_store'
-                    amount = round(random.uniform(30, 200), 2)
-                elif selected_category == 'restaurants':
-                    merchant_name = random.choice(merchant_categories['restaurants'])
-                    category_primary = 'restaurants'
-                    category_detailed = 'restaurant'
-                    amount = round(random.uniform(10, 80), 2)
-                elif selected_category == 'gas':
-                    merchant_name = random.choice(merchant_categories['gas'])
-                    category_primary = 'gas'
-                    category_detailed = 'gas_station'
-                    amount = round(random.uniform(30, 80), 2)
-                elif selected_category == 'utilities':
-                    merchant_name = random.choice(merchant_categories['utilities'])
-                    category_primary = 'utilities'
-                    category_detailed = 'utility_bill'
-                    amount = round(random.uniform(50, 300), 2)
-                elif selected_category == 'shopping':
-                    merchant_name = random.choice(merchant_categories['shopping'])
-                    category_primary = 'shopping'
-                    category_detailed = 'retail'
-                    amount = round(random.uniform(20, 500), 2)
-                elif selected_category == 'subscriptions':
-                    merchant_name = random.choice(merchant_categories['subscriptions'])
-                    category_primary = 'subscriptions'
-                    category_detailed = 'recurring_subscription'
-                    amount = round(random.uniform(5, 50), 2)
-                else:
-                    merchant_name = fake.company()
-                    category_primary = 'other'
-                    category_detailed = 'general'
-                    amount = round(random.uniform(10, 200), 2)
+                # Category was drawn against the cumulative weights above
+                category = category_idx[i]
+                category_primary = EXPENSE_CATEGORY_PRIMARY[category]
+                category_detailed = EXPENSE_CATEGORY_DETAILED[category]
+                merchants = EXPENSE_MERCHANTS[category]
+                merchant_name = merchants[merchant_idx[i]] if merchants else company_pool[company_idx[i]]
                 
                 # Make amount negative for expenses
-                amount = -abs(amount)
-                payment_channel = random.choice(['online', 'in store', 'ACH'])
+                amount = -expense_amounts[i]
+                payment_channel = expense_channels[expense_channel_idx[i]]
             
             # Generate transaction
             transaction = {
-                'transaction_id': f'txn_{uuid.uuid4()}',
+                'transaction_id': transaction_ids[i],
                 'account_id': account['account_id'],
                 'user_id': user_id,
-                'date': transaction_date.date().isoformat(),
+                'date': transaction_day,
                 'amount': amount,
                 'merchant_name': merchant_name,
-                'merchant_entity_id': f'merchant_{uuid.uuid4()}',
+                'merchant_entity_id': merchant_entity_ids[i],
                 'payment_channel': payment_channel,
                 'category_primary': category_primary,
                 'category_detailed': category_detailed,
-                'pending': random.random() < 0.05,  # 5% pending
-                'created_at': transaction_date.isoformat()
+                'pending': pending_flags[i],
+                'created_at': transaction_created_at
             }
-            transactions.append(transaction)
-    
-    return transactions
+            yield transaction
 
 
-def generate_liabilities(users, accounts):
+def generate_liabilities(users, accounts, now=None):
     """
     Generate synthetic liability data for credit card accounts.
     
     Args:
         users: List of user dictionaries
         accounts: List of account dictionaries
+        now: Reference time for generated dates (default: current time)
     
     Returns:
         List of liability dictionaries
     """
     liabilities = []
-    now = datetime.now()
+    now = now or datetime.now()
+    days_ago_iso = _days_ago_iso(now)
+    due_dates = [(now + timedelta(days=days)).date().isoformat() for days in range(31)]
     
     # Filter credit card accounts
     credit_card_accounts = [acc for acc in accounts if acc['type'] == 'credit card']
@@ -541,7 +650,7 @@ def generate_liabilities(users, accounts):
         if user['user_type'] != 'customer':
             continue
         # Assign utilization pattern: 20% high, 30% medium, 50% low
-        roll = random.random()
+        roll = rand.random()
         if roll < 0.2:
             user_utilization_patterns[user['user_id']] = 'high'  # >50%
         elif roll < 0.5:
@@ -549,7 +658,9 @@ def generate_liabilities(users, accounts):
         else:
             user_utilization_patterns[user['user_id']] = 'low'  # <30%
     
-    for account in credit_card_accounts:
+    liability_ids = _id_batch('liab', len(credit_card_accounts))
+    
+    for account, liability_id in zip(credit_card_accounts, liability_ids):
         user_id = account['user_id']
         utilization_pattern = user_utilization_patterns.get(user_id, 'low')
         
@@ -561,48 +672,48 @@ def generate_liabilities(users, accounts):
         if utilization_pattern == 'high':
             # Ensure >50% utilization
             if balance_current / balance_limit < 0.5:
-                balance_current = round(balance_limit * random.uniform(0.5, 0.95), 2)
+                balance_current = round(balance_limit * rand.uniform(0.5, 0.95), 2)
         elif utilization_pattern == 'medium':
             # Ensure 30-50% utilization
             if balance_current / balance_limit < 0.3 or balance_current / balance_limit > 0.5:
-                balance_current = round(balance_limit * random.uniform(0.3, 0.5), 2)
+                balance_current = round(balance_limit * rand.uniform(0.3, 0.5), 2)
         else:  # low
             # Ensure <30% utilization
             if balance_current / balance_limit >= 0.3:
-                balance_current = round(balance_limit * random.uniform(0.05, 0.3), 2)
+                balance_current = round(balance_limit * rand.uniform(0.05, 0.3), 2)
         
         # Generate liability record
-        days_ago = random.randint(0, 180)
-        created_at = (now - timedelta(days=days_ago)).isoformat()
+        days_ago = rand.randint(0, 180)
+        created_at = days_ago_iso[days_ago]
         
         # APR ranges
-        apr_purchase = round(random.uniform(15, 25), 2)
-        apr_balance_transfer = round(random.uniform(0, 21), 2)
-        apr_cash_advance = round(random.uniform(25, 30), 2)
+        apr_purchase = _uniform_2dp(15, 25)
+        apr_balance_transfer = _uniform_2dp(0, 21)
+        apr_cash_advance = _uniform_2dp(25, 30)
         
         # Minimum payment: 2-3% of balance
-        minimum_payment_amount = round(balance_current * random.uniform(0.02, 0.03), 2)
+        minimum_payment_amount = round(balance_current * rand.uniform(0.02, 0.03), 2)
         
         # Last payment: varied (some minimum-only, some full balance)
-        if random.random() < 0.4:  # 40% pay minimum only
+        if rand.random() < 0.4:  # 40% pay minimum only
             last_payment_amount = minimum_payment_amount
         else:
             # Pay more than minimum, up to full balance
-            last_payment_amount = round(random.uniform(minimum_payment_amount, balance_current), 2)
+            last_payment_amount = _uniform_2dp(minimum_payment_amount, balance_current)
         
         # Is overdue: True for 10% of accounts
-        is_overdue = random.random() < 0.1
+        is_overdue = rand.random() < 0.1
         
         # Next payment due date: random future date (within next 30 days)
-        days_until_due = random.randint(1, 30)
-        next_payment_due_date = (now + timedelta(days=days_until_due)).date().isoformat()
+        days_until_due = rand.randint(1, 30)
+        next_payment_due_date = due_dates[days_until_due]
         
         # Last statement balance: close to current balance (±5%)
         variance = balance_current * 0.05
-        last_statement_balance = round(balance_current + random.uniform(-variance, variance), 2)
+        last_statement_balance = round(balance_current + rand.uniform(-variance, variance), 2)
         
         liability = {
-            'liability_id': f'liab_{uuid.uuid4()}',
+            'liability_id': liability_id,
             'account_id': account['account_id'],
             'user_id': user_id,
             'liability_type': 'credit_card',
@@ -621,71 +732,96 @@ def generate_liabilities(users, accounts):
     return liabilities
 
 
+def write_json_array(filepath, records):
+    """
+    Stream records to a JSON array file without building the whole document.
+    
+    Each record is encoded with orjson and written through a 1 MiB buffer; the
+    output is byte-for-byte what orjson.dumps(list, OPT_INDENT_2) produces.
+    
+    Args:
+        filepath: Output file path
+        records: Iterable of JSON-serializable dictionaries
+    
+    Returns:
+        Number of records written
+    """
+    count = 0
+    with open(filepath, 'wb', buffering=1 << 20) as f:
+        for record in records:
+            f.write(b'[\n  ' if count == 0 else b',\n  ')
+            # Nest the record's own indentation one level inside the array
+            f.write(orjson.dumps(record, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n  '))
+            count += 1
+        f.write(b'\n]' if count else b'[]')
+    return count
+
+
 def main():
     """
     Main function that orchestrates data generation.
     """
     print("Generating synthetic data...")
     
+    # Get the script directory and construct data path
+    script_dir = Path(__file__).parent
+    data_dir = script_dir.parent / "data"
+    data_dir.mkdir(exist_ok=True)
+    transactions_file = data_dir / 'synthetic_transactions.json'
+    
+    # One reference time for the whole run, so every generator agrees on
+    # "today" and the 180-day window
+    now = datetime.now()
+    
     # Generate 75 users
     print("Generating users...")
-    users = generate_users(75)
+    users = generate_users(75, now)
     
     # Generate accounts for all users
     print("Generating accounts...")
-    accounts = generate_accounts(users)
+    accounts = generate_accounts(users, now)
     
-    # Generate transactions for all users/accounts
+    # Generate transactions for all users/accounts, streamed straight to disk
+    # so the full transaction list is never held in memory
     print("Generating transactions...")
-    transactions = generate_transactions(users, accounts)
+    num_transactions = write_json_array(transactions_file, iter_transactions(users, accounts, now))
     
     # Generate liabilities for credit card accounts
     print("Generating liabilities...")
-    liabilities = generate_liabilities(users, accounts)
+    liabilities = generate_liabilities(users, accounts, now)
     
     # Print summary statistics
     print("\n=== Summary Statistics ===")
-    customers = [u for u in users if u['user_type'] == 'customer']
-    operators = [u for u in users if u['user_type'] == 'operator']
-    users_with_consent = [u for u in users if u['consent_status']]
+    user_types = Counter(u['user_type'] for u in users)
+    users_with_consent = sum(1 for u in users if u['consent_status'])
     
     print(f"Total users: {len(users)}")
-    print(f"  - Customers: {len(customers)}")
-    print(f"  - Operators: {len(operators)}")
-    print(f"  - Users with consent: {len(users_with_consent)} ({len(users_with_consent)/len(users)*100:.1f}%)")
+    print(f"  - Customers: {user_types['customer']}")
+    print(f"  - Operators: {user_types['operator']}")
+    print(f"  - Users with consent: {users_with_consent} ({users_with_consent/len(users)*100:.1f}%)")
     
     # Account breakdown
-    account_types = {}
-    for account in accounts:
-        acc_type = account['type']
-        account_types[acc_type] = account_types.get(acc_type, 0) + 1
+    account_types = Counter(account['type'] for account in accounts)
     
     print(f"\nTotal accounts: {len(accounts)}")
     for acc_type, count in sorted(account_types.items()):
         print(f"  - {acc_type}: {count}")
     
-    print(f"\nTotal transactions: {len(transactions)}")
+    print(f"\nTotal transactions: {num_transactions}")
     print(f"Total liabilities: {len(liabilities)}")
     
     # Write data to JSON files
     print("\nWriting data to JSON files...")
     
-    # Get the script directory and construct data path
-    script_dir = Path(__file__).parent
-    data_dir = script_dir.parent / "data"
-    data_dir.mkdir(exist_ok=True)
-    
     output_files = {
         data_dir / 'synthetic_users.json': users,
         data_dir / 'synthetic_accounts.json': accounts,
-        data_dir / 'synthetic_transactions.json': transactions,
         data_dir / 'synthetic_liabilities.json': liabilities
     }
     
     for filepath, data in output_files.items():
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-        print(f"  - {filepath}: {len(data)} records")
+        print(f"  - {filepath}: {write_json_array(filepath, data)} records")
+    print(f"  - {transactions_file}: {num_transactions} records")
     
     print("\nData generation complete!")
 
@@ -13,16 +13,17 @@ Usage:
         python backend/scripts/test_bulk_approve.py [user_id] [operator_id]
 """
 
+import asyncio
 import json
 import sys
 from pathlib import Path
 
-# Check if requests is available
+# Check if httpx is available
 try:
-    import requests
+    import httpx
 except ImportError:
     print("=" * 60)
-    print("❌ Error: 'requests' module not found")
+    print("❌ Error: 'httpx' module not found")
     print("=" * 60)
     print("\nPlease activate the virtual environment first:")
     print("  cd backend")
@@ -36,14 +37,20 @@ except ImportError:
 # Base URL for the API
 API_BASE_URL = "http://localhost:8000"
 
+# Connection pool limits for the shared async client
+CLIENT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
 
-def get_pending_recommendations(user_id: str, limit: int = 10):
+# Connection attempts to retry, e.g. while uvicorn is still starting up
+CONNECT_RETRIES = 3
+
+
+async def get_pending_recommendations(client: httpx.AsyncClient, user_id: str, limit: int = 10):
     """Get pending recommendations for a user"""
-    url = f"{API_BASE_URL}/recommendations/{user_id}"
+    path = f"/recommendations/{user_id}"
     params = {"status": "pending_approval"}
     
     try:
-        response = requests.get(url, params=params)
+        response = await client.get(path, params=params)
         response.raise_for_status()
         result = response.json()
         
@@ -54,79 +61,82 @@ def get_pending_recommendations(user_id: str, limit: int = 10):
         return []
 
 
-def test_bulk_approve(recommendation_ids: list, operator_id: str):
+async def test_bulk_approve(client: httpx.AsyncClient, recommendation_ids: list, operator_id: str):
     """Test POST bulk approve recommendations endpoint"""
-    url = f"{API_BASE_URL}/recommendations/bulk-approve"
+    # Buffer the report so concurrent calls print as whole blocks
+    lines = []
+    out = lines.append
+    
+    path = "/recommendations/bulk-approve"
     
     payload = {
         "operator_id": operator_id,
         "recommendation_ids": recommendation_ids
     }
     
-    print(f"\n{'=' * 60}")
-    print(f"Testing POST /recommendations/bulk-approve")
-    print(f"Operator ID: {operator_id}")
-    print(f"Recommendation IDs ({len(recommendation_ids)}):")
+    out(f"\n{'=' * 60}")
+    out(f"Testing POST /recommendations/bulk-approve")
+    out(f"Operator ID: {operator_id}")
+    out(f"Recommendation IDs ({len(recommendation_ids)}):")
     for rec_id in recommendation_ids:
-        print(f"  - {rec_id}")
-    print(f"{'=' * 60}")
+        out(f"  - {rec_id}")
+    out(f"{'=' * 60}")
     
     try:
-        response = requests.post(url, json=payload)
+        response = await client.post(path, json=payload)
         
         if response.status_code == 200:
             result = response.json()
-            print(f"\n✅ Request successful!")
-            print(f"Status Code: {response.status_code}")
-            print(f"\nBulk Approve Results:")
-            print(f"  - Approved: {result.get('approved', 0)}")
-            print(f"  - Failed: {result.get('failed', 0)}")
+            out(f"\n✅ Request successful!")
+            out(f"Status Code: {response.status_code}")
+            out(f"\nBulk Approve Results:")
+            out(f"  - Approved: {result.get('approved', 0)}")
+            out(f"  - Failed: {result.get('failed', 0)}")
             
             if result.get('errors'):
-                print(f"\n  Errors ({len(result.get('errors', []))}):")
+                out(f"\n  Errors ({len(result.get('errors', []))}):")
                 for error in result.get('errors', []):
-                    print(f"    - {error}")
+                    out(f"    - {error}")
             return True
         else:
-            print(f"\n❌ Request failed!")
-            print(f"Status Code: {response.status_code}")
-            try:
-                error_detail = response.json()
-                print(f"Detail: {json.dumps(error_detail, indent=2)}")
-            except:
-                print(f"Response: {response.text}")
+            out(f"\n❌ Request failed!")
+            out(f"Status Code: {response.status_code}")
+            if "application/json" in response.headers.get("content-type", ""):
+                out(f"Detail: {json.dumps(response.json(), indent=2)}")
+            else:
+                out(f"Response: {response.text}")
             return False
     
-    except requests.exceptions.ConnectionError:
-        print(f"\n❌ Error: Could not connect to {API_BASE_URL}")
-        print("Make sure the FastAPI server is running:")
-        print("  cd backend && uvicorn app.main:app --reload")
+    except httpx.ConnectError:
+        out(f"\n❌ Error: Could not connect to {API_BASE_URL}")
+        out("Make sure the FastAPI server is running:")
+        out("  cd backend && uvicorn app.main:app --reload")
         return False
     
     except Exception as e:
-        print(f"\n❌ Error: {e}")
+        out(f"\n❌ Error: {e}")
         return False
+    
+    finally:
+        print("\n".join(lines))
 
 
-def verify_recommendations_status(recommendation_ids: list, user_id: str, expected_status: str):
+async def verify_recommendations_status(client: httpx.AsyncClient, recommendation_ids: list, user_id: str, expected_status: str):
     """Verify recommendations have expected status"""
     print(f"\n📋 Verifying {len(recommendation_ids)} recommendations have status '{expected_status}'")
     
-    url = f"{API_BASE_URL}/recommendations/{user_id}"
+    path = f"/recommendations/{user_id}"
     params = {"status": expected_status}
     
     try:
-        response = requests.get(url, params=params)
+        response = await client.get(path, params=params)
         response.raise_for_status()
         result = response.json()
         
         approved_recs = result.get('recommendations', [])
         approved_ids = {rec.get('recommendation_id') for rec in approved_recs}
         
-        verified = 0
-        for rec_id in recommendation_ids:
-            if rec_id in approved_ids:
-                verified += 1
+        verified = len(set(recommendation_ids).intersection(approved_ids))
         
         print(f"  ✅ Verified {verified}/{len(recommendation_ids)} recommendations have status '{expected_status}'")
         return verified == len(recommendation_ids)
@@ -135,69 +145,75 @@ def verify_recommendations_status(recommendation_ids: list, user_id: str, expect
         return False
 
 
-def main():
+async def main():
     """Main test function"""
-    # Get user_id and operator_id from command line or use defaults
-    if len(sys.argv) > 2:
-        user_id = sys.argv[1]
-        operator_id = sys.argv[2]
-    elif len(sys.argv) > 1:
-        user_id = sys.argv[1]
-        operator_id = "operator_001"
-        print("⚠️  No operator_id provided. Using default 'operator_001'")
-    else:
-        user_id = "user_001"
-        operator_id = "operator_001"
-        print("⚠️  No arguments provided. Using defaults:")
-        print(f"   user_id: {user_id}")
-        print(f"   operator_id: {operator_id}")
-        print("   Usage: python backend/scripts/test_bulk_approve.py <user_id> <operator_id>")
-    
-    print("=" * 60)
-    print("Testing POST Bulk Approve Recommendations Endpoint")
-    print("=" * 60)
-    
-    # Get pending recommendations
-    print(f"\n📋 Step 1: Getting pending recommendations for user {user_id}")
-    pending_recs = get_pending_recommendations(user_id, limit=10)
-    
-    if not pending_recs:
-        print(f"❌ No pending recommendations found for user {user_id}")
-        print("   Please generate recommendations first:")
-        print(f"   POST /recommendations/generate/{user_id}")
-        return
-    
-    print(f"✅ Found {len(pending_recs)} pending recommendations")
-    recommendation_ids = [rec.get('recommendation_id') for rec in pending_recs]
-    
-    # Test 1: Bulk approve all pending recommendations
-    print("\n📋 Test 1: Bulk approve all pending recommendations")
-    success = test_bulk_approve(recommendation_ids, operator_id)
-    
-    if success:
-        # Test 2: Verify all changed to approved
-        print("\n📋 Test 2: Verify all changed to approved")
-        verify_recommendations_status(recommendation_ids, user_id, "approved")
+    transport = httpx.AsyncHTTPTransport(retries=CONNECT_RETRIES, limits=CLIENT_LIMITS)
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=10.0, transport=transport) as client:
+        # Get user_id and operator_id from command line or use defaults
+        if len(sys.argv) > 2:
+            user_id = sys.argv[1]
+            operator_id = sys.argv[2]
+        elif len(sys.argv) > 1:
+            user_id = sys.argv[1]
+            operator_id = "operator_001"
+            print("⚠️  No operator_id provided. Using default 'operator_001'")
+        else:
+            user_id = "user_001"
+            operator_id = "operator_001"
+            print("⚠️  No arguments provided. Using defaults:")
+            print(f"   user_id: {user_id}")
+            print(f"   operator_id: {operator_id}")
+            print("   Usage: python backend/scripts/test_bulk_approve.py <user_id> <operator_id>")
         
-        # Test 3: Test with mix of valid and invalid IDs
-        print("\n📋 Test 3: Test with mix of valid and invalid IDs")
-        mixed_ids = recommendation_ids[:2] + ["invalid_rec_12345", "invalid_rec_67890"]
-        test_bulk_approve(mixed_ids, operator_id)
+        print("=" * 60)
+        print("Testing POST Bulk Approve Recommendations Endpoint")
+        print("=" * 60)
         
-        # Test 4: Test with already approved recommendations (should fail)
-        print("\n📋 Test 4: Test with already approved recommendations (should fail)")
-        if recommendation_ids:
-            test_bulk_approve(recommendation_ids[:2], operator_id)
-    
-    # Test 5: Test with all invalid IDs (should return 400)
-    print("\n📋 Test 5: Test with all invalid IDs (should return 400)")
-    test_bulk_approve(["invalid_rec_1", "invalid_rec_2", "invalid_rec_3"], operator_id)
-    
-    print("\n" + "=" * 60)
-    print("✅ All tests completed!")
-    print("=" * 60)
+        # Get pending recommendations
+        print(f"\n📋 Step 1: Getting pending recommendations for user {user_id}")
+        pending_recs = await get_pending_recommendations(client, user_id, limit=10)
+        
+        if not pending_recs:
+            print(f"❌ No pending recommendations found for user {user_id}")
+            print("   Please generate recommendations first:")
+            print(f"   POST /recommendations/generate/{user_id}")
+            return
+        
+        print(f"✅ Found {len(pending_recs)} pending recommendations")
+        recommendation_ids = [rec.get('recommendation_id') for rec in pending_recs]
+        
+        # Test 1: Bulk approve all pending recommendations
+        print("\n📋 Test 1: Bulk approve all pending recommendations")
+        success = await test_bulk_approve(client, recommendation_ids, operator_id)
+        
+        if success:
+            # Test 2: Verify all changed to approved
+            print("\n📋 Test 2: Verify all changed to approved")
+            await verify_recommendations_status(client, recommendation_ids, user_id, "approved")
+        
+        # Tests 3-5 don't depend on each other, so send them concurrently
+        invalid_ids = ["invalid_rec_1", "invalid_rec_2", "invalid_rec_3"]
+        if success:
+            # Test 3: Test with mix of valid and invalid IDs
+            # Test 4: Test with already approved recommendations (should fail)
+            # Test 5: Test with all invalid IDs (should return 400)
+            print("\n📋 Tests 3-5: Mixed valid/invalid IDs, already approved IDs (should fail), all invalid IDs (should return 400)")
+            mixed_ids = recommendation_ids[:2] + ["invalid_rec_12345", "invalid_rec_67890"]
+            await asyncio.gather(
+                test_bulk_approve(client, mixed_ids, operator_id),
+                test_bulk_approve(client, recommendation_ids[:2], operator_id),
+                test_bulk_approve(client, invalid_ids, operator_id)
+            )
+        else:
+            # Test 5: Test with all invalid IDs (should return 400)
+            print("\n📋 Test 5: Test with all invalid IDs (should return 400)")
+            await test_bulk_approve(client, invalid_ids, operator_id)
+        
+        print("\n" + "=" * 60)
+        print("✅ All tests completed!")
+        print("=" * 60)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
@@ -4,29 +4,83 @@ Test script for recommendation engine context builder
 
 Tests the build_user_context function with multiple user IDs from the database.
 Verifies all required fields are present and data looks realistic.
+
+On a terminal each user gets a readable report; when stdout is redirected
+(CI logs, pipes) each user is summarized as one JSON line instead.
 """
 
+import argparse
 import sys
-import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
 
+import orjson
+
 # Add backend to path (where app/ module lives)
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, and_
 from sqlalchemy.orm import sessionmaker
 from app.database import SQLALCHEMY_DATABASE_URL
 from app.services.recommendation_engine import build_user_context, validate_context
 from app.models import User, UserFeature, Persona, Account, Transaction
 
+# Persona types the context builder may report
+VALID_PERSONAS = frozenset({
+    'high_utilization',
+    'variable_income',
+    'subscription_heavy',
+    'savings_builder',
+    'wealth_builder'
+})
+
+# Report templates for the signal sections of the context
+SUBSCRIPTION_SIGNALS_TEMPLATE = (
+    "\n  Subscription Signals:\n"
+    "    - recurring_merchants: {recurring_merchants}\n"
+    "    - monthly_recurring_spend: ${monthly_recurring_spend:.2f}\n"
+    "    - subscription_spend_share: {subscription_spend_share:.2%}"
+)
+SAVINGS_SIGNALS_TEMPLATE = (
+    "\n  Savings Signals:\n"
+    "    - net_savings_inflow: ${net_savings_inflow:.2f}/month\n"
+    "    - savings_growth_rate: {savings_growth_rate:.2%}\n"
+    "    - emergency_fund_months: {emergency_fund_months:.2f} months"
+)
+CREDIT_SIGNALS_TEMPLATE = (
+    "\n  Credit Signals:\n"
+    "    - avg_utilization: {avg_utilization:.2%}\n"
+    "    - max_utilization: {max_utilization:.2%}\n"
+    "    - utilization_30_flag: {utilization_30_flag}\n"
+    "    - utilization_50_flag: {utilization_50_flag}\n"
+    "    - utilization_80_flag: {utilization_80_flag}\n"
+    "    - minimum_payment_only_flag: {minimum_payment_only_flag}\n"
+    "    - interest_charges_present: {interest_charges_present}\n"
+    "    - any_overdue: {any_overdue}"
+)
+INCOME_SIGNALS_TEMPLATE = (
+    "\n  Income Signals:\n"
+    "    - payroll_detected: {payroll_detected}\n"
+    "    - median_pay_gap_days: {median_pay_gap_days}\n"
+    "    - income_variability: {income_variability}\n"
+    "    - cash_flow_buffer_months: {cash_flow_buffer_months:.2f} months\n"
+    "    - avg_monthly_income: ${avg_monthly_income:.2f}"
+)
+
+# Human-readable reports on a terminal; one JSON line per user otherwise
+# (CI logs, pipes) so the float formatting of the report is skipped
+PRETTY = sys.stdout.isatty()
+
 
-def estimate_token_count(text: str) -> int:
+def estimate_token_count(text) -> int:
     """
     Rough estimate of token count (1 token ≈ 4 characters for English text).
     
     Args:
-        text: Text to estimate tokens for
+        text: Text (str or UTF-8 bytes) to estimate tokens for
     
     Returns:
         Estimated token count
@@ -34,13 +88,40 @@ def estimate_token_count(text: str) -> int:
     return len(text) // 4
 
 
-def test_context_builder(db, user_id: str, window_days: int):
-    """Test context building for a specific user"""
-    print(f"\n{'='*80}")
-    print(f"Testing Context Builder")
-    print(f"User ID: {user_id[:30]}...")
-    print(f"Window: {window_days} days")
-    print(f"{'='*80}\n")
+def test_context_builder(db, user_id: str, window_days: int, quiet: bool = False):
+    """
+    Test context building for a specific user.
+    
+    Args:
+        db: Database session
+        user_id: User to build the context for
+        window_days: Feature window
+        quiet: Skip the signal dump and only print the report if the user fails
+            (only applies to the human-readable report, see PRETTY)
+    
+    Returns:
+        True if the context is valid and has all required fields
+    """
+    # Collect the report and write it once at the end, so reports from
+    # concurrent workers don't interleave and each line isn't its own write
+    lines = []
+    out = lines.append
+    passed = False
+    summary = {
+        "user_id": user_id,
+        "window_days": window_days,
+        "passed": False,
+        "persona_type": None,
+        "token_estimate": None,
+        "missing_fields": [],
+        "error": None,
+    }
+    
+    out(f"\n{'='*80}")
+    out(f"Testing Context Builder")
+    out(f"User ID: {user_id[:30]}...")
+    out(f"Window: {window_days} days")
+    out(f"{'='*80}\n")
     
     try:
         # Build context
@@ -50,102 +131,79 @@ def test_context_builder(db, user_id: str, window_days: int):
         is_valid = validate_context(context)
         
         if not is_valid:
-            print("❌ Context validation FAILED")
+            out("❌ Context validation FAILED")
+            summary["error"] = "context validation failed"
             return False
         
-        print("✅ Context validation PASSED\n")
-        
-        # Print context structure
-        print("Context Structure:")
-        print(f"  - user_id: {context['user_id']}")
-        print(f"  - window_days: {context['window_days']}")
-        print(f"  - persona_type: {context['persona_type']}")
-        
-        # Print subscription signals
-        print(f"\n  Subscription Signals:")
-        sub_signals = context['subscription_signals']
-        print(f"    - recurring_merchants: {sub_signals['recurring_merchants']}")
-        print(f"    - monthly_recurring_spend: ${sub_signals['monthly_recurring_spend']:.2f}")
-        print(f"    - subscription_spend_share: {sub_signals['subscription_spend_share']:.2%}")
-        
-        # Print savings signals
-        print(f"\n  Savings Signals:")
-        sav_signals = context['savings_signals']
-        print(f"    - net_savings_inflow: ${sav_signals['net_savings_inflow']:.2f}/month")
-        print(f"    - savings_growth_rate: {sav_signals['savings_growth_rate']:.2%}")
-        print(f"    - emergency_fund_months: {sav_signals['emergency_fund_months']:.2f} months")
-        
-        # Print credit signals
-        print(f"\n  Credit Signals:")
-        cred_signals = context['credit_signals']
-        print(f"    - avg_utilization: {cred_signals['avg_utilization']:.2%}")
-        print(f"    - max_utilization: {cred_signals['max_utilization']:.2%}")
-        print(f"    - utilization_30_flag: {cred_signals['utilization_30_flag']}")
-        print(f"    - utilization_50_flag: {cred_signals['utilization_50_flag']}")
-        print(f"    - utilization_80_flag: {cred_signals['utilization_80_flag']}")
-        print(f"    - minimum_payment_only_flag: {cred_signals['minimum_payment_only_flag']}")
-        print(f"    - interest_charges_present: {cred_signals['interest_charges_present']}")
-        print(f"    - any_overdue: {cred_signals['any_overdue']}")
-        
-        # Print income signals
-        print(f"\n  Income Signals:")
-        inc_signals = context['income_signals']
-        print(f"    - payroll_detected: {inc_signals['payroll_detected']}")
-        print(f"    - median_pay_gap_days: {inc_signals['median_pay_gap_days']}")
-        print(f"    - income_variability: {inc_signals['income_variability']}")
-        print(f"    - cash_flow_buffer_months: {inc_signals['cash_flow_buffer_months']:.2f} months")
-        print(f"    - avg_monthly_income: ${inc_signals['avg_monthly_income']:.2f}")
-        
-        # Print accounts
-        print(f"\n  Accounts ({len(context['accounts'])}):")
-        for i, account in enumerate(context['accounts'][:5], 1):
-            print(f"    {i}. {account['name']}")
-            print(f"       Type: {account['type']}")
-            print(f"       Balance: ${account['balance']:,.2f}")
-            if 'limit' in account:
-                print(f"       Limit: ${account['limit']:,.2f}")
-        
-        # Print recent transactions
-        print(f"\n  Recent Transactions ({len(context['recent_transactions'])}):")
-        for i, txn in enumerate(context['recent_transactions'][:5], 1):
-            print(f"    {i}. {txn['date']} - {txn['merchant']}")
-            print(f"       {txn['type']}: ${abs(txn['amount']):,.2f}")
-        
-        # Print high utilization cards if present
-        if 'high_utilization_cards' in context:
-            print(f"\n  High Utilization Credit Cards ({len(context['high_utilization_cards'])}):")
-            for i, card in enumerate(context['high_utilization_cards'], 1):
-                print(f"    {i}. Card ending in {card['last_4_digits']}")
-                print(f"       Balance: ${card['current_balance']:,.2f}")
-                print(f"       Limit: ${card['credit_limit']:,.2f}")
-                print(f"       Utilization: {card['utilization_percentage']:.1f}%")
-                if 'estimated_monthly_interest' in card:
-                    print(f"       Est. Monthly Interest: ${card['estimated_monthly_interest']:.2f}")
-        
-        # Print recurring merchants if present
-        if 'recurring_merchants' in context:
-            print(f"\n  Recurring Merchants ({len(context['recurring_merchants'])}):")
-            for merchant in context['recurring_merchants'][:5]:
-                print(f"    - {merchant}")
-        
-        # Print savings accounts info if present
-        if 'savings_accounts' in context:
-            sav_info = context['savings_accounts']
-            print(f"\n  Savings Accounts Info:")
-            print(f"    - Count: {sav_info['count']}")
-            print(f"    - Total Balance: ${sav_info['total_balance']:,.2f}")
-            print(f"    - Growth Rate: {sav_info['growth_rate']:.2%}")
-            print(f"    - Emergency Fund: {sav_info['emergency_fund_months']:.2f} months")
-        
-        # Convert to JSON and estimate token count
-        context_json = json.dumps(context, indent=2)
+        out("✅ Context validation PASSED\n")
+        
+        # Per-signal dump (skipped with --quiet or when not on a terminal)
+        if PRETTY and not quiet:
+            # Print context structure
+            out("Context Structure:")
+            out(f"  - user_id: {context['user_id']}")
+            out(f"  - window_days: {context['window_days']}")
+            out(f"  - persona_type: {context['persona_type']}")
+            
+            # Print signal sections
+            out(SUBSCRIPTION_SIGNALS_TEMPLATE.format_map(context['subscription_signals']))
+            out(SAVINGS_SIGNALS_TEMPLATE.format_map(context['savings_signals']))
+            out(CREDIT_SIGNALS_TEMPLATE.format_map(context['credit_signals']))
+            out(INCOME_SIGNALS_TEMPLATE.format_map(context['income_signals']))
+            
+            # Print accounts
+            out(f"\n  Accounts ({len(context['accounts'])}):")
+            for i, account in enumerate(islice(context['accounts'], 5), 1):
+                out(f"    {i}. {account['name']}")
+                out(f"       Type: {account['type']}")
+                out(f"       Balance: ${account['balance']:,.2f}")
+                if 'limit' in account:
+                    out(f"       Limit: ${account['limit']:,.2f}")
+            
+            # Print recent transactions
+            out(f"\n  Recent Transactions ({len(context['recent_transactions'])}):")
+            for i, txn in enumerate(islice(context['recent_transactions'], 5), 1):
+                out(f"    {i}. {txn['date']} - {txn['merchant']}")
+                out(f"       {txn['type']}: ${abs(txn['amount']):,.2f}")
+            
+            # Print high utilization cards if present
+            if 'high_utilization_cards' in context:
+                out(f"\n  High Utilization Credit Cards ({len(context['high_utilization_cards'])}):")
+                for i, card in enumerate(context['high_utilization_cards'], 1):
+                    out(f"    {i}. Card ending in {card['last_4_digits']}")
+                    out(f"       Balance: ${card['current_balance']:,.2f}")
+                    out(f"       Limit: ${card['credit_limit']:,.2f}")
+                    out(f"       Utilization: {card['utilization_percentage']:.1f}%")
+                    if 'estimated_monthly_interest' in card:
+                        out(f"       Est. Monthly Interest: ${card['estimated_monthly_interest']:.2f}")
+            
+            # Print recurring merchants if present
+            if 'recurring_merchants' in context:
+                out(f"\n  Recurring Merchants ({len(context['recurring_merchants'])}):")
+                for merchant in islice(context['recurring_merchants'], 5):
+                    out(f"    - {merchant}")
+            
+            # Print savings accounts info if present
+            if 'savings_accounts' in context:
+                sav_info = context['savings_accounts']
+                out(f"\n  Savings Accounts Info:")
+                out(f"    - Count: {sav_info['count']}")
+                out(f"    - Total Balance: ${sav_info['total_balance']:,.2f}")
+                out(f"    - Growth Rate: {sav_info['growth_rate']:.2%}")
+                out(f"    - Emergency Fund: {sav_info['emergency_fund_months']:.2f} months")
+        
+        # Estimate token count from the same serialization the prompt uses
+        # (orjson bytes, so no intermediate str is built just to measure it)
+        context_json = orjson.dumps(context, option=orjson.OPT_INDENT_2)
         token_estimate = estimate_token_count(context_json)
+        summary["token_estimate"] = token_estimate
+        summary["persona_type"] = context['persona_type']
         
-        print(f"\n  Token Estimate: ~{token_estimate} tokens")
+        out(f"\n  Token Estimate: ~{token_estimate} tokens")
         if token_estimate > 2000:
-            print(f"  ⚠️  Warning: Context exceeds 2000 token target (current: {token_estimate})")
+            out(f"  ⚠️  Warning: Context exceeds 2000 token target (current: {token_estimate})")
         else:
-            print(f"  ✅ Token count within target (<2000)")
+            out(f"  ✅ Token count within target (<2000)")
         
         # Verify all required fields present
         required_fields = [
@@ -160,58 +218,69 @@ def test_context_builder(db, user_id: str, window_days: int):
             "recent_transactions",
         ]
         
-        print(f"\n  Required Fields Check:")
-        all_present = True
+        out(f"\n  Required Fields Check:")
+        missing = set(required_fields).difference(context.keys())
+        all_present = not missing
+        summary["missing_fields"] = sorted(missing)
         for field in required_fields:
-            if field in context:
-                print(f"    ✅ {field}")
-            else:
-                print(f"    ❌ {field} - MISSING")
-                all_present = False
+            out(f"    ❌ {field} - MISSING" if field in missing else f"    ✅ {field}")
         
         # Verify data looks realistic
-        print(f"\n  Data Quality Checks:")
+        out(f"\n  Data Quality Checks:")
         
         # Check account balances are reasonable
         if context['accounts']:
-            max_balance = max(acc['balance'] for acc in context['accounts'])
+            max_balance = max(context['accounts'], key=itemgetter('balance'))['balance']
             if max_balance > 1000000:
-                print(f"    ⚠️  Very high account balance detected: ${max_balance:,.2f}")
+                out(f"    ⚠️  Very high account balance detected: ${max_balance:,.2f}")
             else:
-                print(f"    ✅ Account balances look reasonable")
+                out(f"    ✅ Account balances look reasonable")
         
         # Check transaction count
         if len(context['recent_transactions']) > 0:
-            print(f"    ✅ Recent transactions present ({len(context['recent_transactions'])})")
+            out(f"    ✅ Recent transactions present ({len(context['recent_transactions'])})")
         else:
-            print(f"    ⚠️  No recent transactions found")
+            out(f"    ⚠️  No recent transactions found")
         
         # Check persona type is valid
-        valid_personas = [
-            'high_utilization',
-            'variable_income',
-            'subscription_heavy',
-            'savings_builder',
-            'wealth_builder'
-        ]
-        if context['persona_type'] in valid_personas or context['persona_type'] is None:
-            print(f"    ✅ Persona type valid: {context['persona_type']}")
+        if context['persona_type'] is None or context['persona_type'] in VALID_PERSONAS:
+            out(f"    ✅ Persona type valid: {context['persona_type']}")
         else:
-            print(f"    ⚠️  Unexpected persona type: {context['persona_type']}")
+            out(f"    ⚠️  Unexpected persona type: {context['persona_type']}")
         
+        passed = all_present
+        summary["passed"] = all_present
         return all_present
         
     except Exception as e:
-        print(f"❌ Error building context: {e}")
+        out(f"❌ Error building context: {e}")
+        summary["error"] = str(e)
         import traceback
-        traceback.print_exc()
+        out(traceback.format_exc().rstrip())
         return False
+    
+    finally:
+        if not PRETTY:
+            sys.stdout.write(orjson.dumps(summary).decode() + "\n")
+        elif not (quiet and passed):
+            sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
     """Main test function"""
+    parser = argparse.ArgumentParser(description="Test the recommendation context builder")
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Skip the per-user signal dump; only print failing users and the summary"
+    )
+    args = parser.parse_args()
+    
     # Create database session
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    # Worker threads each open their own session, so SQLite connections
+    # must be allowed to move between threads via the pool
+    connect_args = {"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
     SessionLocal = sessionmaker(bind=engine)
     db = SessionLocal()
     
@@ -220,14 +289,28 @@ def main():
         print("Recommendation Engine Context Builder Test")
         print("=" * 80)
         
+        # Test with 30-day window
+        window_days = 30
+        
+        # Fetch each user together with their window feature row in one query
+        # (outer join so users without features come back with None)
+        feature_join = and_(
+            UserFeature.user_id == User.user_id,
+            UserFeature.window_days == window_days
+        )
+        
         # Get users with personas assigned
-        users_with_personas = db.query(User).join(Persona).filter(
+        users_with_personas = db.query(User, UserFeature).join(Persona).outerjoin(
+            UserFeature, feature_join
+        ).filter(
             User.user_type == 'customer'
         ).distinct().limit(5).all()
         
         if not users_with_personas:
             print("\nNo users with personas found. Testing with any users...")
-            users_with_personas = db.query(User).filter(
+            users_with_personas = db.query(User, UserFeature).outerjoin(
+                UserFeature, feature_join
+            ).filter(
                 User.user_type == 'customer'
             ).limit(5).all()
         
@@ -237,32 +320,32 @@ def main():
         
         print(f"\nTesting context builder for {len(users_with_personas)} users...")
         
-        # Test with 30-day window
-        window_days = 30
-        success_count = 0
-        fail_count = 0
+        user_ids = []
+        for user, feature in users_with_personas:
+            if feature is None:
+                print(f"\n⚠️  Skipping user {user.user_id[:20]}... (no features computed for {window_days}d window)")
+                continue
+            user_ids.append(user.user_id)
         
-        for user in users_with_personas:
+        def run_one(user_id: str):
+            """Test one user on its own session (sessions are not thread-safe)"""
+            worker_db = SessionLocal()
             try:
-                # Check if user has features computed
-                feature = db.query(UserFeature).filter(
-                    UserFeature.user_id == user.user_id,
-                    UserFeature.window_days == window_days
-                ).first()
-                
-                if not feature:
-                    print(f"\n⚠️  Skipping user {user.user_id[:20]}... (no features computed for {window_days}d window)")
-                    continue
+                return test_context_builder(worker_db, user_id, window_days, quiet=args.quiet)
                 
-                success = test_context_builder(db, user.user_id, window_days)
-                if success:
-                    success_count += 1
-                else:
-                    fail_count += 1
-                    
             except Exception as e:
-                print(f"\n❌ Error testing user {user.user_id[:20]}...: {e}")
-                fail_count += 1
+                print(f"\n❌ Error testing user {user_id[:20]}...: {e}")
+                return False
+            
+            finally:
+                worker_db.close()
+        
+        # Users are independent, so run their DB-bound checks concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(5, len(user_ids)))) as executor:
+            results = list(executor.map(run_one, user_ids))
+        
+        success_count = sum(1 for result in results if result)
+        fail_count = len(results) - success_count
         
         print("\n" + "=" * 80)
         print("Test Summary")
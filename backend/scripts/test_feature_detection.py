@@ -6,134 +6,334 @@ Tests the subscription and savings detection logic with users from the database.
 """
 
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
 # Add backend to path (where app/ module lives)
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, select
 from sqlalchemy.orm import sessionmaker
-from app.database import SQLALCHEMY_DATABASE_URL
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
 from app.services.feature_detection import (
     compute_subscription_signals,
     compute_savings_signals,
     compute_credit_signals,
     compute_income_signals,
     detect_investment_accounts,
-    get_accounts_by_type,
-    get_transactions_in_window
+    SAVINGS_ACCOUNT_TYPES
 )
 from app.models import User, Transaction, Account, Liability
-from collections import defaultdict
 
 
-def test_subscription_detection(db, users, window_days):
+def load_accounts_by_user(db, user_ids):
+    """
+    Load all accounts for the given users in one query.
+    
+    Only the columns the report shows are selected and rows are streamed,
+    so no Account instances are built.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to include
+    
+    Returns:
+        Dict mapping user_id to that user's list of account rows
+    """
+    accounts_by_user = defaultdict(list)
+    accounts = db.query(
+        Account.user_id,
+        Account.account_id,
+        Account.type,
+        Account.balance_current,
+        Account.balance_limit
+    ).filter(Account.user_id.in_(user_ids)).yield_per(1000)
+    for account in accounts:
+        accounts_by_user[account.user_id].append(account)
+    return accounts_by_user
+
+
+def load_credit_liabilities_by_user(db, user_ids):
+    """
+    Load credit card liabilities for the given users in one query.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to include
+    
+    Returns:
+        Dict mapping user_id to that user's list of liability rows
+    """
+    liabilities_by_user = defaultdict(list)
+    liabilities = db.query(
+        Liability.user_id,
+        Liability.minimum_payment_amount,
+        Liability.last_payment_amount,
+        Liability.is_overdue
+    ).filter(
+        Liability.user_id.in_(user_ids),
+        Liability.liability_type == 'credit_card'
+    ).yield_per(1000)
+    for liability in liabilities:
+        liabilities_by_user[liability.user_id].append(liability)
+    return liabilities_by_user
+
+
+def count_transactions_by_user(db, user_ids):
+    """
+    Count all transactions per user in one GROUP BY query.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to include
+    
+    Returns:
+        Dict mapping user_id to transaction count (users without any are absent)
+    """
+    rows = db.query(Transaction.user_id, func.count()).filter(
+        Transaction.user_id.in_(user_ids)
+    ).group_by(Transaction.user_id)
+    return dict(rows.all())
+
+
+def sum_savings_balances_by_user(db, user_ids):
+    """
+    Total savings-type account balances per user in one GROUP BY query.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to include
+    
+    Returns:
+        Dict mapping user_id to total savings balance (users without savings
+        accounts are absent)
+    """
+    rows = db.query(
+        Account.user_id,
+        func.coalesce(func.sum(Account.balance_current), 0.0)
+    ).filter(
+        Account.user_id.in_(user_ids),
+        Account.type.in_(SAVINGS_ACCOUNT_TYPES)
+    ).group_by(Account.user_id)
+    return dict(rows.all())
+
+
+def load_user_context(db, users):
+    """
+    Prefetch the window-independent per-user data the test sections display.
+    
+    Loaded once in main() and shared by both windows, instead of being
+    refetched by each section for every window.
+    
+    Args:
+        db: Database session
+        users: User rows (user_id, full_name) to include
+    
+    Returns:
+        Dict mapping user_id to a dict with transaction_count, savings_accounts,
+        savings_balance, credit_accounts, credit_liabilities and has_investments
+    """
+    user_ids = [user.user_id for user in users]
+    accounts_by_user = load_accounts_by_user(db, user_ids)
+    liabilities_by_user = load_credit_liabilities_by_user(db, user_ids)
+    txn_counts = count_transactions_by_user(db, user_ids)
+    savings_balances = sum_savings_balances_by_user(db, user_ids)
+    
+    savings_types = set(SAVINGS_ACCOUNT_TYPES)
+    
+    user_context = {}
+    for user_id in user_ids:
+        accounts = accounts_by_user[user_id]
+        user_context[user_id] = {
+            'transaction_count': txn_counts.get(user_id, 0),
+            'savings_accounts': [acc for acc in accounts if acc.type in savings_types],
+            'savings_balance': savings_balances.get(user_id, 0.0),
+            'credit_accounts': [acc for acc in accounts if acc.type == 'credit card'],
+            'credit_liabilities': liabilities_by_user[user_id],
+            # Window-independent, so checked once per user rather than per window
+            'has_investments': detect_investment_accounts(db, user_id),
+        }
+    return user_context
+
+
+def compute_user_signals(SessionLocal, user_id, window_days):
+    """
+    Compute every signal group for one user on its own session.
+    
+    Runs on worker threads, so it opens a session per call rather than
+    sharing one (sessions are not thread-safe).
+    
+    Args:
+        SessionLocal: Session factory
+        user_id: User to compute signals for
+        window_days: Feature window
+    
+    Returns:
+        Dict with subscription, savings, credit and income signals
+    """
+    db = SessionLocal()
+    try:
+        return {
+            'subscription': compute_subscription_signals(db, user_id, window_days),
+            'savings': compute_savings_signals(db, user_id, window_days),
+            'credit': compute_credit_signals(db, user_id, window_days),
+            'income': compute_income_signals(db, user_id, window_days),
+        }
+    finally:
+        db.close()
+
+
+def get_merchant_counts(db, user_ids, window_days):
+    """
+    Count transactions per (user, merchant) in the window for all users at once.
+    
+    Args:
+        db: Database session
+        user_ids: User IDs to include
+        window_days: Number of days to look back from today
+    
+    Returns:
+        DataFrame with user_id, merchant_name and txn_count columns
+    """
+    cutoff_date = date.today() - timedelta(days=window_days)
+    
+    query = select(
+        Transaction.user_id,
+        Transaction.merchant_name,
+        func.count().label("txn_count")
+    ).where(
+        Transaction.user_id.in_(user_ids),
+        Transaction.date >= cutoff_date,
+        Transaction.merchant_name.isnot(None),
+        Transaction.merchant_name != ''
+    ).group_by(Transaction.user_id, Transaction.merchant_name)
+    
+    return pd.DataFrame(
+        db.execute(query).all(),
+        columns=["user_id", "merchant_name", "txn_count"]
+    )
+
+
+def test_subscription_detection(db, users, window_days, user_context, signals_by_user):
     """Test subscription detection with users from database"""
-    print(f"\n{'='*60}")
-    print(f"Subscription Signals - Window: {window_days} days")
-    print(f"{'='*60}")
-    print()
+    # Collect the section and write it once instead of a write per line
+    lines = []
+    out = lines.append
+    
+    out(f"\n{'='*60}")
+    out(f"Subscription Signals - Window: {window_days} days")
+    out(f"{'='*60}")
+    out("")
+    
+    # Merchants with 3+ transactions in the window, top 5 per user, from a
+    # single GROUP BY over all users instead of refetching each user's window
+    merchant_counts = get_merchant_counts(db, [user.user_id for user in users], window_days)
+    recurring = merchant_counts[merchant_counts['txn_count'] >= 3]
+    recurring_examples = {
+        user_id: group.nlargest(5, 'txn_count')
+        for user_id, group in recurring.groupby('user_id')
+    }
     
     for user in users:
         # Get transaction count for this user
-        txn_count = db.query(Transaction).filter(
-            Transaction.user_id == user.user_id
-        ).count()
+        txn_count = user_context[user.user_id]['transaction_count']
         
         if txn_count == 0:
             continue
         
         # Compute subscription signals
-        signals = compute_subscription_signals(db, user.user_id, window_days)
+        signals = signals_by_user[user.user_id]['subscription']
         
         # Display results
-        print(f"User: {user.full_name} ({user.user_id[:20]}...)")
-        print(f"  Transactions in window: {txn_count}")
-        print(f"  Recurring merchants: {signals['recurring_merchants']}")
-        print(f"  Monthly recurring spend: ${signals['monthly_recurring_spend']:.2f}")
-        print(f"  Subscription spend share: {signals['subscription_spend_share']:.2%}")
+        out(f"User: {user.full_name} ({user.user_id[:20]}...)")
+        out(f"  Transactions in window: {txn_count}")
+        out(f"  Recurring merchants: {signals['recurring_merchants']}")
+        out(f"  Monthly recurring spend: ${signals['monthly_recurring_spend']:.2f}")
+        out(f"  Subscription spend share: {signals['subscription_spend_share']:.2%}")
         
         # Show merchants if recurring detected
-        if signals['recurring_merchants'] > 0:
-            # Get transactions to find recurring merchants
-            transactions = get_transactions_in_window(db, user.user_id, window_days)
-            
-            # Group by merchant
-            merchant_counts = defaultdict(int)
-            for txn in transactions:
-                if txn.merchant_name:
-                    merchant_counts[txn.merchant_name] += 1
-            
-            # Show merchants with 3+ transactions
-            recurring_merchants_list = [
-                (merchant, count) 
-                for merchant, count in merchant_counts.items() 
-                if count >= 3
-            ]
-            
-            if recurring_merchants_list:
-                print(f"  Recurring merchant examples:")
-                for merchant, count in recurring_merchants_list[:5]:  # Show top 5
-                    print(f"    - {merchant}: {count} transactions")
+        examples = recurring_examples.get(user.user_id)
+        if signals['recurring_merchants'] > 0 and examples is not None:
+            out(f"  Recurring merchant examples:")
+            for merchant, count in zip(examples['merchant_name'], examples['txn_count']):
+                out(f"    - {merchant}: {count} transactions")
         
-        print()
+        out("")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
-def test_savings_detection(db, users, window_days):
+def test_savings_detection(db, users, window_days, user_context, signals_by_user):
     """Test savings detection with users from database"""
-    print(f"\n{'='*60}")
-    print(f"Savings Signals - Window: {window_days} days")
-    print(f"{'='*60}")
-    print()
+    # Collect the section and write it once instead of a write per line
+    lines = []
+    out = lines.append
+    
+    out(f"\n{'='*60}")
+    out(f"Savings Signals - Window: {window_days} days")
+    out(f"{'='*60}")
+    out("")
     
     users_with_savings = 0
     users_without_savings = 0
     
     for user in users:
         # Check if user has savings accounts
-        savings_accounts = get_accounts_by_type(db, user.user_id, ['savings', 'money market', 'cash management', 'HSA'])
+        savings_accounts = user_context[user.user_id]['savings_accounts']
         
         # Compute savings signals
-        signals = compute_savings_signals(db, user.user_id, window_days)
+        signals = signals_by_user[user.user_id]['savings']
         
         # Display results
-        print(f"User: {user.full_name} ({user.user_id[:20]}...)")
+        out(f"User: {user.full_name} ({user.user_id[:20]}...)")
         
         if savings_accounts:
             users_with_savings += 1
-            print(f"  Savings accounts: {len(savings_accounts)}")
-            total_balance = sum(acc.balance_current or 0.0 for acc in savings_accounts)
-            print(f"  Total savings balance: ${total_balance:,.2f}")
+            out(f"  Savings accounts: {len(savings_accounts)}")
+            total_balance = user_context[user.user_id]['savings_balance']
+            out(f"  Total savings balance: ${total_balance:,.2f}")
         else:
             users_without_savings += 1
-            print(f"  Savings accounts: 0 (no savings accounts)")
+            out(f"  Savings accounts: 0 (no savings accounts)")
         
-        print(f"  Net savings inflow: ${signals['net_savings_inflow']:.2f}/month")
-        print(f"  Savings growth rate: {signals['savings_growth_rate']:.2%}")
-        print(f"  Emergency fund months: {signals['emergency_fund_months']:.2f}")
+        out(f"  Net savings inflow: ${signals['net_savings_inflow']:.2f}/month")
+        out(f"  Savings growth rate: {signals['savings_growth_rate']:.2%}")
+        out(f"  Emergency fund months: {signals['emergency_fund_months']:.2f}")
         
         # Validate calculations
         if savings_accounts and signals['net_savings_inflow'] != 0:
-            print(f"  ✓ Net inflow calculated")
+            out(f"  ✓ Net inflow calculated")
         if savings_accounts and signals['savings_growth_rate'] != 0:
-            print(f"  ✓ Growth rate calculated")
+            out(f"  ✓ Growth rate calculated")
         if signals['emergency_fund_months'] > 0:
-            print(f"  ✓ Emergency fund calculated")
+            out(f"  ✓ Emergency fund calculated")
         
-        print()
+        out("")
     
-    print(f"Summary:")
-    print(f"  Users with savings accounts: {users_with_savings}")
-    print(f"  Users without savings accounts: {users_without_savings}")
+    out(f"Summary:")
+    out(f"  Users with savings accounts: {users_with_savings}")
+    out(f"  Users without savings accounts: {users_without_savings}")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
-def test_credit_detection(db, users, window_days):
+def test_credit_detection(db, users, window_days, user_context, signals_by_user):
     """Test credit detection with users from database"""
-    print(f"\n{'='*60}")
-    print(f"Credit Signals - Window: {window_days} days")
-    print(f"{'='*60}")
-    print()
+    # Collect the section and write it once instead of a write per line
+    lines = []
+    out = lines.append
+    
+    out(f"\n{'='*60}")
+    out(f"Credit Signals - Window: {window_days} days")
+    out(f"{'='*60}")
+    out("")
     
     users_with_credit = 0
     users_without_credit = 0
@@ -144,51 +344,48 @@ def test_credit_detection(db, users, window_days):
     
     for user in users:
         # Check if user has credit card accounts
-        credit_accounts = get_accounts_by_type(db, user.user_id, ['credit card'])
+        credit_accounts = user_context[user.user_id]['credit_accounts']
         
         # Compute credit signals
-        signals = compute_credit_signals(db, user.user_id, window_days)
+        signals = signals_by_user[user.user_id]['credit']
         
         # Display results
-        print(f"User: {user.full_name} ({user.user_id[:20]}...)")
+        out(f"User: {user.full_name} ({user.user_id[:20]}...)")
         
         if credit_accounts:
             users_with_credit += 1
-            print(f"  Credit card accounts: {len(credit_accounts)}")
+            out(f"  Credit card accounts: {len(credit_accounts)}")
             
-            # Show account details
-            for account in credit_accounts:
-                balance = account.balance_current or 0.0
-                limit = account.balance_limit or 0.0
-                utilization = (balance / limit * 100) if limit > 0 else 0.0
-                print(f"    - Account {account.account_id[:20]}...: ${balance:,.2f} / ${limit:,.2f} ({utilization:.1f}%)")
+            # Show account details (utilization computed for all accounts at once)
+            balances = np.fromiter((a.balance_current or 0.0 for a in credit_accounts), dtype=np.float64)
+            limits = np.fromiter((a.balance_limit or 0.0 for a in credit_accounts), dtype=np.float64)
+            utils = np.divide(balances, limits, out=np.zeros_like(balances), where=limits > 0) * 100
+            for account, balance, limit, utilization in zip(credit_accounts, balances, limits, utils):
+                out(f"    - Account {account.account_id[:20]}...: ${balance:,.2f} / ${limit:,.2f} ({utilization:.1f}%)")
             
             # Show liability details
-            liabilities = db.query(Liability).filter(
-                Liability.user_id == user.user_id,
-                Liability.liability_type == 'credit_card'
-            ).all()
+            liabilities = user_context[user.user_id]['credit_liabilities']
             
             if liabilities:
-                print(f"  Liabilities: {len(liabilities)}")
+                out(f"  Liabilities: {len(liabilities)}")
                 for liab in liabilities:
                     min_payment = liab.minimum_payment_amount or 0.0
                     last_payment = liab.last_payment_amount or 0.0
                     overdue = "Yes" if liab.is_overdue else "No"
-                    print(f"    - Min payment: ${min_payment:.2f}, Last payment: ${last_payment:.2f}, Overdue: {overdue}")
+                    out(f"    - Min payment: ${min_payment:.2f}, Last payment: ${last_payment:.2f}, Overdue: {overdue}")
         else:
             users_without_credit += 1
-            print(f"  Credit card accounts: 0 (no credit cards)")
+            out(f"  Credit card accounts: 0 (no credit cards)")
         
-        print(f"  Average utilization: {signals['avg_utilization']:.2%}")
-        print(f"  Max utilization: {signals['max_utilization']:.2%}")
-        print(f"  Utilization flags:")
-        print(f"    - ≥30%: {signals['utilization_30_flag']}")
-        print(f"    - ≥50%: {signals['utilization_50_flag']}")
-        print(f"    - ≥80%: {signals['utilization_80_flag']}")
-        print(f"  Minimum payment only: {signals['minimum_payment_only_flag']}")
-        print(f"  Interest charges present: {signals['interest_charges_present']}")
-        print(f"  Any overdue: {signals['any_overdue']}")
+        out(f"  Average utilization: {signals['avg_utilization']:.2%}")
+        out(f"  Max utilization: {signals['max_utilization']:.2%}")
+        out(f"  Utilization flags:")
+        out(f"    - ≥30%: {signals['utilization_30_flag']}")
+        out(f"    - ≥50%: {signals['utilization_50_flag']}")
+        out(f"    - ≥80%: {signals['utilization_80_flag']}")
+        out(f"  Minimum payment only: {signals['minimum_payment_only_flag']}")
+        out(f"  Interest charges present: {signals['interest_charges_present']}")
+        out(f"  Any overdue: {signals['any_overdue']}")
         
         # Track statistics
         if signals['max_utilization'] > 0.50:
@@ -202,23 +399,29 @@ def test_credit_detection(db, users, window_days):
         if signals['any_overdue']:
             overdue_count += 1
         
-        print()
+        out("")
+    
+    out(f"Summary:")
+    out(f"  Users with credit cards: {users_with_credit}")
+    out(f"  Users without credit cards: {users_without_credit}")
+    out(f"  Users with high utilization (>50%): {high_utilization_count}")
+    out(f"  Users with low utilization (<30%): {low_utilization_count}")
+    out(f"  Users making minimum payments only: {min_payment_only_count}")
+    out(f"  Users with overdue accounts: {overdue_count}")
     
-    print(f"Summary:")
-    print(f"  Users with credit cards: {users_with_credit}")
-    print(f"  Users without credit cards: {users_without_credit}")
-    print(f"  Users with high utilization (>50%): {high_utilization_count}")
-    print(f"  Users with low utilization (<30%): {low_utilization_count}")
-    print(f"  Users making minimum payments only: {min_payment_only_count}")
-    print(f"  Users with overdue accounts: {overdue_count}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
-def test_income_detection(db, users, window_days):
+def test_income_detection(db, users, window_days, user_context, signals_by_user):
     """Test income detection with users from database"""
-    print(f"\n{'='*60}")
-    print(f"Income Signals - Window: {window_days} days")
-    print(f"{'='*60}")
-    print()
+    # Collect the section and write it once instead of a write per line
+    lines = []
+    out = lines.append
+    
+    out(f"\n{'='*60}")
+    out(f"Income Signals - Window: {window_days} days")
+    out(f"{'='*60}")
+    out("")
     
     users_with_payroll = 0
     users_without_payroll = 0
@@ -229,21 +432,21 @@ def test_income_detection(db, users, window_days):
     
     for user in users:
         # Compute income signals
-        signals = compute_income_signals(db, user.user_id, window_days)
+        signals = signals_by_user[user.user_id]['income']
         
         # Detect investment accounts
-        has_investments = detect_investment_accounts(db, user.user_id)
+        has_investments = user_context[user.user_id]['has_investments']
         
         # Display results
-        print(f"User: {user.full_name} ({user.user_id[:20]}...)")
-        print(f"  Payroll detected: {signals['payroll_detected']}")
+        out(f"User: {user.full_name} ({user.user_id[:20]}...)")
+        out(f"  Payroll detected: {signals['payroll_detected']}")
         
         if signals['payroll_detected']:
             users_with_payroll += 1
-            print(f"  Median pay gap: {signals['median_pay_gap_days']} days")
-            print(f"  Income variability: {signals['income_variability']:.3f}")
-            print(f"  Average monthly income: ${signals['avg_monthly_income']:,.2f}")
-            print(f"  Cash flow buffer: {signals['cash_flow_buffer_months']:.2f} months")
+            out(f"  Median pay gap: {signals['median_pay_gap_days']} days")
+            out(f"  Income variability: {signals['income_variability']:.3f}")
+            out(f"  Average monthly income: ${signals['avg_monthly_income']:,.2f}")
+            out(f"  Cash flow buffer: {signals['cash_flow_buffer_months']:.2f} months")
             
             # Track statistics
             if signals['median_pay_gap_days']:
@@ -259,24 +462,35 @@ def test_income_detection(db, users, window_days):
                 low_buffer_count += 1
         else:
             users_without_payroll += 1
-            print(f"  No payroll detected (<2 payroll transactions)")
+            out(f"  No payroll detected (<2 payroll transactions)")
         
-        print(f"  Investment accounts: {'Yes' if has_investments else 'No'}")
-        print()
+        out(f"  Investment accounts: {'Yes' if has_investments else 'No'}")
+        out("")
     
-    print(f"Summary:")
-    print(f"  Users with payroll detected: {users_with_payroll}")
-    print(f"  Users without payroll: {users_without_payroll}")
-    print(f"  Users with regular biweekly income: {regular_income_count}")
-    print(f"  Users with irregular income: {irregular_income_count}")
-    print(f"  Users with high income variability (>0.2): {high_variability_count}")
-    print(f"  Users with low cash flow buffer (<1 month): {low_buffer_count}")
+    out(f"Summary:")
+    out(f"  Users with payroll detected: {users_with_payroll}")
+    out(f"  Users without payroll: {users_without_payroll}")
+    out(f"  Users with regular biweekly income: {regular_income_count}")
+    out(f"  Users with irregular income: {irregular_income_count}")
+    out(f"  Users with high income variability (>0.2): {high_variability_count}")
+    out(f"  Users with low cash flow buffer (<1 month): {low_buffer_count}")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
     """Main test function"""
     # Create database session
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    # The compute_* services issue many small per-user statements; a larger
+    # compiled-statement cache keeps all of their shapes cached (default 500).
+    # check_same_thread is off so pooled SQLite connections can change threads.
+    connect_args = {"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        query_cache_size=1200,
+        connect_args=connect_args
+    )
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
     SessionLocal = sessionmaker(bind=engine)
     db = SessionLocal()
     
@@ -287,7 +501,7 @@ def main():
         print()
         
         # Get all users
-        users = db.query(User).filter(User.user_type == 'customer').limit(10).all()
+        users = db.query(User.user_id, User.full_name).filter(User.user_type == 'customer').limit(10).all()
         
         if not users:
             print("No users found in database. Please run data ingestion first.")
@@ -295,25 +509,46 @@ def main():
         
         print(f"Testing feature detection for {len(users)} users...")
         
+        # Accounts, liabilities and transaction counts don't depend on the
+        # window, so load them once for both window runs
+        user_context = load_user_context(db, users)
+        
         # Test both 30-day and 180-day windows
         windows = [30, 180]
+        user_ids = [user.user_id for user in users]
         
-        for window_days in windows:
-            print(f"\n{'='*80}")
-            print(f"WINDOW: {window_days} DAYS")
-            print(f"{'='*80}")
-            
-            # Test subscription detection
-            test_subscription_detection(db, users, window_days)
-            
-            # Test savings detection
-            test_savings_detection(db, users, window_days)
-            
-            # Test credit detection
-            test_credit_detection(db, users, window_days)
+        # Users' signal computations are independent reads, so run them on a
+        # thread pool (WAL lets the SQLite readers proceed concurrently) and
+        # print the sections afterwards in user order. Both windows are
+        # submitted up front (executor.map queues every call immediately), so
+        # the 180-day computations run while the 30-day sections print
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pending_signals = {
+                window_days: executor.map(
+                    partial(compute_user_signals, SessionLocal, window_days=window_days),
+                    user_ids
+                )
+                for window_days in windows
+            }
             
-            # Test income detection
-            test_income_detection(db, users, window_days)
+            for window_days in windows:
+                print(f"\n{'='*80}")
+                print(f"WINDOW: {window_days} DAYS")
+                print(f"{'='*80}")
+                
+                signals_by_user = dict(zip(user_ids, pending_signals[window_days]))
+                
+                # Test subscription detection
+                test_subscription_detection(db, users, window_days, user_context, signals_by_user)
+                
+                # Test savings detection
+                test_savings_detection(db, users, window_days, user_context, signals_by_user)
+                
+                # Test credit detection
+                test_credit_detection(db, users, window_days, user_context, signals_by_user)
+                
+                # Test income detection
+                test_income_detection(db, users, window_days, user_context, signals_by_user)
         
         print("\n" + "=" * 60)
         print("✅ All tests completed!")
@@ -13,16 +13,17 @@ Usage:
         python backend/scripts/test_get_recommendations.py [user_id]
 """
 
+import asyncio
 import json
 import sys
 from pathlib import Path
 
-# Check if requests is available
+# Check if httpx is available
 try:
-    import requests
+    import httpx
 except ImportError:
     print("=" * 60)
-    print("❌ Error: 'requests' module not found")
+    print("❌ Error: 'httpx' module not found")
     print("=" * 60)
     print("\nPlease activate the virtual environment first:")
     print("  cd backend")
@@ -36,10 +37,26 @@ except ImportError:
 # Base URL for the API
 API_BASE_URL = "http://localhost:8000"
 
+# Connection pool limits for the shared async client
+CLIENT_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
 
-def test_get_recommendations(user_id: str, status: str = None, window_days: int = None):
+# Connection attempts to retry, e.g. while uvicorn is still starting up
+CONNECT_RETRIES = 3
+
+
+async def test_get_recommendations(
+    client: httpx.AsyncClient,
+    label: str,
+    user_id: str,
+    status: str = None,
+    window_days: int = None
+):
     """Test GET recommendations endpoint"""
-    url = f"{API_BASE_URL}/recommendations/{user_id}"
+    # Buffer the report so concurrent calls print as whole blocks
+    lines = []
+    out = lines.append
+    
+    path = f"/recommendations/{user_id}"
     params = {}
     
     if status:
@@ -47,58 +64,60 @@ def test_get_recommendations(user_id: str, status: str = None, window_days: int
     if window_days:
         params["window_days"] = window_days
     
-    print(f"\n{'=' * 60}")
-    print(f"Testing GET /recommendations/{user_id}")
+    out(f"\n📋 {label}")
+    out(f"\n{'=' * 60}")
+    out(f"Testing GET /recommendations/{user_id}")
     if params:
-        print(f"Query params: {params}")
-    print(f"{'=' * 60}")
+        out(f"Query params: {params}")
+    out(f"{'=' * 60}")
     
     try:
-        response = requests.get(url, params=params)
+        response = await client.get(path, params=params)
         response.raise_for_status()
         
         result = response.json()
         
-        print(f"\n✅ Request successful!")
-        print(f"Status Code: {response.status_code}")
-        print(f"Total recommendations: {result.get('total', 0)}")
-        print(f"Returned recommendations: {len(result.get('recommendations', []))}")
+        out(f"\n✅ Request successful!")
+        out(f"Status Code: {response.status_code}")
+        out(f"Total recommendations: {result.get('total', 0)}")
+        out(f"Returned recommendations: {len(result.get('recommendations', []))}")
         
         if result.get('recommendations'):
-            print(f"\nFirst recommendation:")
+            out(f"\nFirst recommendation:")
             rec = result['recommendations'][0]
-            print(f"  - ID: {rec.get('recommendation_id')}")
-            print(f"  - Title: {rec.get('title', '')[:50]}...")
-            print(f"  - Status: {rec.get('status')}")
-            print(f"  - Persona: {rec.get('persona_type')}")
-            print(f"  - Generated at: {rec.get('generated_at')}")
+            out(f"  - ID: {rec.get('recommendation_id')}")
+            out(f"  - Title: {rec.get('title', '')[:50]}...")
+            out(f"  - Status: {rec.get('status')}")
+            out(f"  - Persona: {rec.get('persona_type')}")
+            out(f"  - Generated at: {rec.get('generated_at')}")
         else:
-            print("\n⚠️  No recommendations found")
+            out("\n⚠️  No recommendations found")
         
         return True
     
-    except requests.exceptions.ConnectionError:
-        print(f"\n❌ Error: Could not connect to {API_BASE_URL}")
-        print("Make sure the FastAPI server is running:")
-        print("  cd backend && uvicorn app.main:app --reload")
+    except httpx.ConnectError:
+        out(f"\n❌ Error: Could not connect to {API_BASE_URL}")
+        out("Make sure the FastAPI server is running:")
+        out("  cd backend && uvicorn app.main:app --reload")
         return False
     
-    except requests.exceptions.HTTPError as e:
-        print(f"\n❌ HTTP Error: {e}")
-        if e.response is not None:
-            try:
-                error_detail = e.response.json()
-                print(f"Detail: {error_detail}")
-            except:
-                print(f"Response: {e.response.text}")
+    except httpx.HTTPStatusError as e:
+        out(f"\n❌ HTTP Error: {e}")
+        if "application/json" in e.response.headers.get("content-type", ""):
+            out(f"Detail: {e.response.json()}")
+        else:
+            out(f"Response: {e.response.text}")
         return False
     
     except Exception as e:
-        print(f"\n❌ Error: {e}")
+        out(f"\n❌ Error: {e}")
         return False
+    
+    finally:
+        print("\n".join(lines))
 
 
-def main():
+async def main():
     """Main test function"""
     # Get user_id from command line or use default
     if len(sys.argv) > 1:
@@ -113,29 +132,23 @@ def main():
     print("Testing GET Recommendations Endpoint")
     print("=" * 60)
     
-    # Test 1: Get all recommendations (default - should only show approved for customers)
-    print("\n📋 Test 1: Get recommendations (default)")
-    test_get_recommendations(user_id)
-    
-    # Test 2: Get pending_approval recommendations
-    print("\n📋 Test 2: Get pending_approval recommendations")
-    test_get_recommendations(user_id, status="pending_approval")
-    
-    # Test 3: Get approved recommendations
-    print("\n📋 Test 3: Get approved recommendations")
-    test_get_recommendations(user_id, status="approved")
-    
-    # Test 4: Get recommendations with window_days filter
-    print("\n📋 Test 4: Get recommendations with window_days=30")
-    test_get_recommendations(user_id, window_days=30)
-    
-    # Test 5: Get recommendations with both filters
-    print("\n📋 Test 5: Get approved recommendations with window_days=30")
-    test_get_recommendations(user_id, status="approved", window_days=30)
+    test_cases = [
+        # Default - should only show approved for customers
+        ("Test 1: Get recommendations (default)", {"user_id": user_id}),
+        ("Test 2: Get pending_approval recommendations", {"user_id": user_id, "status": "pending_approval"}),
+        ("Test 3: Get approved recommendations", {"user_id": user_id, "status": "approved"}),
+        ("Test 4: Get recommendations with window_days=30", {"user_id": user_id, "window_days": 30}),
+        ("Test 5: Get approved recommendations with window_days=30", {"user_id": user_id, "status": "approved", "window_days": 30}),
+        ("Test 6: Test with non-existent user", {"user_id": "non_existent_user_12345"}),
+    ]
     
-    # Test 6: Test with non-existent user
-    print("\n📋 Test 6: Test with non-existent user")
-    test_get_recommendations("non_existent_user_12345")
+    # The test cases are independent reads, so send them concurrently
+    transport = httpx.AsyncHTTPTransport(retries=CONNECT_RETRIES, limits=CLIENT_LIMITS)
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=10.0, transport=transport) as client:
+        await asyncio.gather(*(
+            test_get_recommendations(client, label, **kwargs)
+            for label, kwargs in test_cases
+        ))
     
     print("\n" + "=" * 60)
     print("✅ All tests completed!")
@@ -143,5 +156,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
@@ -19,8 +19,9 @@ sys.path.insert(0, str(backend_dir))
 db_path = backend_dir / "spendsense.db"
 os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
 
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal, engine, Base, set_sqlite_batch_pragmas
 from app.models import User, UserFeature
 from app.services.guardrails import (
     validate_tone,
@@ -34,6 +35,22 @@ from app.services.guardrails import (
 )
 
 
+def get_user_with_features(db: Session):
+    """
+    Get a user and their 30-day features in one joined query.
+    
+    Selects both entities from the join instead of re-querying the
+    features row; the uq_user_features_user_window index covers the lookup.
+    
+    Returns:
+        (user, features), or (None, None) if no user has 30-day features
+    """
+    row = db.query(User, UserFeature).join(UserFeature).filter(
+        UserFeature.window_days == 30
+    ).first()
+    return row if row else (None, None)
+
+
 def test_tone_validation():
     """Test tone validation with various examples"""
     print("\n" + "="*80)
@@ -138,16 +155,9 @@ def test_eligibility_checks(db: Session):
     print("="*80)
     
     # Get a user with features
-    user_with_features = db.query(User).join(UserFeature).filter(
-        UserFeature.window_days == 30
-    ).first()
+    user_with_features, features = get_user_with_features(db)
     
     if user_with_features:
-        features = db.query(UserFeature).filter(
-            UserFeature.user_id == user_with_features.user_id,
-            UserFeature.window_days == 30
-        ).first()
-        
         print(f"\n1. Testing income eligibility for user: {user_with_features.user_id}")
         print(f"   User's avg_monthly_income: ${features.avg_monthly_income or 0:.2f}")
         
@@ -209,16 +219,9 @@ def test_partner_offer_filtering(db: Session):
     print("="*80)
     
     # Get a user with features
-    user_with_features = db.query(User).join(UserFeature).filter(
-        UserFeature.window_days == 30
-    ).first()
+    user_with_features, features = get_user_with_features(db)
     
     if user_with_features:
-        features = db.query(UserFeature).filter(
-            UserFeature.user_id == user_with_features.user_id,
-            UserFeature.window_days == 30
-        ).first()
-        
         # Create test offers
         offers = [
             {
@@ -303,7 +306,8 @@ def main():
     print("GUARDRAILS SERVICE TESTS")
     print("="*80)
     
-    # Initialize database session
+    # Initialize database session, with the batch scripts' SQLite cache/mmap pragmas
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
     db = SessionLocal()
     
     try:
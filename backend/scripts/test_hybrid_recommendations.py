@@ -7,6 +7,7 @@ Verifies that both educational and product recommendations are generated correct
 """
 
 import sys
+from collections import defaultdict
 from pathlib import Path
 import json
 
@@ -14,14 +15,62 @@ import json
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.database import SQLALCHEMY_DATABASE_URL
+from app.database import SQLALCHEMY_DATABASE_URL, set_sqlite_batch_pragmas
 from app.services.recommendation_engine import generate_combined_recommendations
+from app.services.feature_detection import SAVINGS_ACCOUNT_TYPES
 from app.models import User, UserFeature, Persona, Account, Recommendation
 
+PERSONA_TYPES = (
+    "high_utilization",
+    "savings_builder",
+    "variable_income",
+    "subscription_heavy",
+    "wealth_builder"
+)
 
-def test_high_utilization_user(db):
+
+def load_test_personas(db):
+    """
+    Load one 30-day persona per persona type, with its user and account types.
+    
+    Replaces the separate persona, user and account lookups each test used to
+    make with one persona/user join and one account query.
+    
+    Args:
+        db: Database session
+    
+    Returns:
+        Dict mapping persona_type to (persona, user, account types), in the
+        order the personas were found
+    """
+    rows = db.query(Persona, User).join(
+        User, Persona.user_id == User.user_id
+    ).filter(
+        Persona.window_days == 30,
+        Persona.persona_type.in_(PERSONA_TYPES)
+    ).yield_per(100)
+    
+    # Keep the first persona of each type; stop streaming once all are found
+    personas = {}
+    for persona, user in rows:
+        personas.setdefault(persona.persona_type, (persona, user))
+        if len(personas) == len(PERSONA_TYPES):
+            break
+    
+    account_types = defaultdict(list)
+    user_ids = [user.user_id for _, user in personas.values()]
+    for user_id, account_type in db.query(Account.user_id, Account.type).filter(Account.user_id.in_(user_ids)):
+        account_types[user_id].append(account_type)
+    
+    return {
+        persona_type: (persona, user, account_types[user.user_id])
+        for persona_type, (persona, user) in personas.items()
+    }
+
+
+def test_high_utilization_user(db, personas):
     """Test with high_utilization user"""
     print(f"\n{'='*60}")
     print("High Utilization User Test")
@@ -29,17 +78,13 @@ def test_high_utilization_user(db):
     print()
     
     # Find user with high utilization persona
-    persona = db.query(Persona).filter(
-        Persona.persona_type == "high_utilization",
-        Persona.window_days == 30
-    ).first()
+    persona, user, _ = personas.get("high_utilization", (None, None, []))
     
     if not persona:
         print("  No high_utilization user found in database")
         return
     
     user_id = persona.user_id
-    user = db.query(User).filter(User.user_id == user_id).first()
     
     print(f"User: {user.full_name if user else 'Unknown'} ({user_id[:20]}...)")
     print(f"  Persona: {persona.persona_type}")
@@ -106,7 +151,7 @@ def test_high_utilization_user(db):
         print()
 
 
-def test_savings_builder_user(db):
+def test_savings_builder_user(db, personas):
     """Test with savings_builder user"""
     print(f"\n{'='*60}")
     print("Savings Builder User Test")
@@ -114,21 +159,16 @@ def test_savings_builder_user(db):
     print()
     
     # Find user with savings_builder persona
-    persona = db.query(Persona).filter(
-        Persona.persona_type == "savings_builder",
-        Persona.window_days == 30
-    ).first()
+    persona, user, account_types = personas.get("savings_builder", (None, None, []))
     
     if not persona:
         print("  No savings_builder user found in database")
         return
     
     user_id = persona.user_id
-    user = db.query(User).filter(User.user_id == user_id).first()
     
     # Check if user has existing HYSA
-    accounts = db.query(Account).filter(Account.user_id == user_id).all()
-    has_hysa = any(acc.type in ["savings", "money market", "cash management", "HSA"] for acc in accounts)
+    has_hysa = any(account_type in SAVINGS_ACCOUNT_TYPES for account_type in account_types)
     
     print(f"User: {user.full_name if user else 'Unknown'} ({user_id[:20]}...)")
     print(f"  Persona: {persona.persona_type}")
@@ -167,17 +207,14 @@ def test_savings_builder_user(db):
     print()
 
 
-def test_variable_income_user(db):
+def test_variable_income_user(db, personas):
     """Test with variable_income user"""
     print(f"\n{'='*60}")
     print("Variable Income User Test")
     print(f"{'='*60}")
     print()
     
-    persona = db.query(Persona).filter(
-        Persona.persona_type == "variable_income",
-        Persona.window_days == 30
-    ).first()
+    persona, _, _ = personas.get("variable_income", (None, None, []))
     
     if not persona:
         print("  No variable_income user found in database")
@@ -204,17 +241,14 @@ def test_variable_income_user(db):
     print()
 
 
-def test_subscription_heavy_user(db):
+def test_subscription_heavy_user(db, personas):
     """Test with subscription_heavy user"""
     print(f"\n{'='*60}")
     print("Subscription Heavy User Test")
     print(f"{'='*60}")
     print()
     
-    persona = db.query(Persona).filter(
-        Persona.persona_type == "subscription_heavy",
-        Persona.window_days == 30
-    ).first()
+    persona, _, _ = personas.get("subscription_heavy", (None, None, []))
     
     if not persona:
         print("  No subscription_heavy user found in database")
@@ -241,17 +275,14 @@ def test_subscription_heavy_user(db):
     print()
 
 
-def test_wealth_builder_user(db):
+def test_wealth_builder_user(db, personas):
     """Test with wealth_builder user"""
     print(f"\n{'='*60}")
     print("Wealth Builder User Test")
     print(f"{'='*60}")
     print()
     
-    persona = db.query(Persona).filter(
-        Persona.persona_type == "wealth_builder",
-        Persona.window_days == 30
-    ).first()
+    persona, _, _ = personas.get("wealth_builder", (None, None, []))
     
     if not persona:
         print("  No wealth_builder user found in database")
@@ -278,7 +309,7 @@ def test_wealth_builder_user(db):
     print()
 
 
-def test_no_eligible_products(db):
+def test_no_eligible_products(db, personas):
     """Test edge case: no eligible products"""
     print(f"\n{'='*60}")
     print("Edge Case: No Eligible Products")
@@ -286,9 +317,7 @@ def test_no_eligible_products(db):
     print()
     
     # Use any user - we'll verify that if no products match, only education is returned
-    persona = db.query(Persona).filter(
-        Persona.window_days == 30
-    ).first()
+    persona = next((persona for persona, _, _ in personas.values()), None)
     
     if not persona:
         print("  No user found in database")
@@ -374,6 +403,8 @@ def verify_database_storage(db):
                         print(f"  ✓ Product recommendation {rec.recommendation_id} has product_data in metadata")
                     else:
                         print(f"  ⚠ Product recommendation {rec.recommendation_id} missing product_data in metadata")
+                except json.JSONDecodeError:
+                    print(f"  ⚠ Product recommendation {rec.recommendation_id} has invalid metadata JSON")
     
     print()
     print(f"  Education recommendations: {education_count}")
@@ -389,17 +420,21 @@ def main():
     
     # Create database connection
     engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", set_sqlite_batch_pragmas)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
     
     try:
+        # Look up every test persona and user up front
+        personas = load_test_personas(db)
+        
         # Run tests
-        test_high_utilization_user(db)
-        test_savings_builder_user(db)
-        test_variable_income_user(db)
-        test_subscription_heavy_user(db)
-        test_wealth_builder_user(db)
-        test_no_eligible_products(db)
+        test_high_utilization_user(db, personas)
+        test_savings_builder_user(db, personas)
+        test_variable_income_user(db, personas)
+        test_subscription_heavy_user(db, personas)
+        test_wealth_builder_user(db, personas)
+        test_no_eligible_products(db, personas)
         verify_database_storage(db)
         
         print("=" * 60)